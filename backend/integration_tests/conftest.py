@@ -0,0 +1,146 @@
+import os
+from typing import TYPE_CHECKING, Callable
+
+import django
+import pytest
+from django.apps import apps
+from rest_framework.response import Response
+
+if TYPE_CHECKING:
+    from pytest_django.plugin import DjangoDbBlocker
+
+    from src.services.rate_limiter_service import RateLimiterService
+    from src.services.storage_limit_service import StorageLimitService
+
+# Configure Django settings once for every integration test module
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.core.settings")
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--reuse-bucket",
+        action="store_true",
+        default=False,
+        help="Keep S3 test buckets between runs (emptied at session start), "
+        "analogous to --reuse-db",
+    )
+
+
+def pytest_configure() -> None:
+    """Set up Django unless pytest-django has already done so"""
+    if not apps.ready:
+        django.setup()
+
+    # Tests call the views directly and read response.data, so skip instantiating
+    # and negotiating the browsable API renderer on every request. This must run
+    # before rest_framework.views is imported, which binds the renderer classes.
+    from django.conf import settings
+    from rest_framework.settings import api_settings
+
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_RENDERER_CLASSES": ["rest_framework.renderers.JSONRenderer"],
+    }
+    api_settings.reload()
+
+
+# FileViewSet.as_view() introspects the viewset on every call, so the view callables
+# shared by the API tests are built once per session. Each dispatch still creates a
+# fresh FileViewSet, so monkeypatched environment variables are picked up per request.
+@pytest.fixture(scope="session")
+def create_view() -> Callable[..., Response]:
+    """POST /files/ view callable"""
+    from src.files.views import FileViewSet
+
+    return FileViewSet.as_view({"post": "create"})
+
+
+@pytest.fixture(scope="session")
+def delete_view() -> Callable[..., Response]:
+    """DELETE /files/{id}/ view callable"""
+    from src.files.views import FileViewSet
+
+    return FileViewSet.as_view({"delete": "destroy"})
+
+
+@pytest.fixture(scope="session")
+def retrieve_view() -> Callable[..., Response]:
+    """GET /files/{id}/ view callable"""
+    from src.files.views import FileViewSet
+
+    return FileViewSet.as_view({"get": "retrieve"})
+
+
+@pytest.fixture(scope="session")
+def download_view() -> Callable[..., Response]:
+    """GET /files/{id}/download/ view callable"""
+    from src.files.views import FileViewSet
+
+    return FileViewSet.as_view({"get": "download"})
+
+
+@pytest.fixture(scope="session")
+def list_view() -> Callable[..., Response]:
+    """GET /files/ view callable, also accepting POST /files/ for seeding via the API"""
+    from src.files.views import FileViewSet
+
+    return FileViewSet.as_view({"get": "list", "post": "create"})
+
+
+@pytest.fixture(scope="session")
+def stats_view() -> Callable[..., Response]:
+    """GET /files/storage_stats/ view callable"""
+    from src.files.views import FileViewSet
+
+    return FileViewSet.as_view({"get": "user_storage_stats"})
+
+
+@pytest.fixture(scope="session")
+def storage_service() -> "StorageLimitService":
+    """
+    StorageLimitService shared across the session.
+    Usage is memoized per user, so call invalidate() after changing a user's files.
+    """
+    from src.services.storage_limit_service import StorageLimitService
+
+    return StorageLimitService()
+
+
+@pytest.fixture(autouse=True)
+def shared_rate_limiter(monkeypatch: pytest.MonkeyPatch) -> "RateLimiterService":
+    """
+    Give every test a fresh FileViewSet rate limiter, since the real one is shared
+    across requests. The limit is raised so tests can upload in quick succession.
+    """
+    from src.files.views import FileViewSet
+    from src.services.rate_limiter_service import RateLimiterService
+
+    rate_limiter = RateLimiterService()
+    rate_limiter.max_calls = 1000
+    monkeypatch.setattr(FileViewSet, "rate_limiter", rate_limiter)
+    return rate_limiter
+
+
+def _uses_database(item: pytest.Item) -> bool:
+    """Whether a collected test gets the test database set up for it"""
+    fixturenames = getattr(item, "fixturenames", ())
+    return item.get_closest_marker("django_db") is not None or any(
+        name in fixturenames for name in ("db", "transactional_db")
+    )
+
+
+@pytest.fixture(scope="session", autouse=True)
+def warm_model_metadata(
+    request: pytest.FixtureRequest, django_db_blocker: "DjangoDbBlocker"
+) -> None:
+    """Run one throwaway query so the first test doesn't pay ORM cold-start costs"""
+    # pytest-django only creates the test database when a collected test needs it,
+    # so there is nothing to warm up for e.g. the pure service tests
+    if not any(_uses_database(item) for item in request.session.items):
+        return
+    request.getfixturevalue("django_db_setup")
+
+    from src.files.models import File
+
+    with django_db_blocker.unblock():
+        File.objects.exists()
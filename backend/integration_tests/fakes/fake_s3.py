@@ -0,0 +1,70 @@
+import io
+from typing import BinaryIO, Iterator
+
+
+class FakeS3FileService:
+    """
+    In-process stand-in for S3FileService that keeps object bytes in memory.
+    Objects are stored per bucket at class level, so every instance created for the
+    same bucket (e.g. one per view dispatch) sees the same objects.
+    """
+
+    _buckets: dict[str, dict[str, bytes]] = {}
+
+    def __init__(self, bucket_name: str, **kwargs: str | None) -> None:
+        # Credentials, endpoint and region are accepted for signature compatibility
+        self.bucket_name: str = bucket_name
+
+    @property
+    def _objects(self) -> dict[str, bytes]:
+        try:
+            return self._buckets[self.bucket_name]
+        except KeyError:
+            raise Exception(f"Bucket {self.bucket_name} does not exist")
+
+    def upload_fileobj(self, file_obj: BinaryIO, source_path: str) -> None:
+        self._objects[source_path] = file_obj.read()
+
+    def upload_file(self, local_path: str, source_path: str) -> None:
+        with open(local_path, "rb") as file_obj:
+            self._objects[source_path] = file_obj.read()
+
+    def download_fileobj(self, source_path: str) -> io.BytesIO:
+        try:
+            return io.BytesIO(self._objects[source_path])
+        except KeyError:
+            raise Exception(f"Failed to download file from S3: NoSuchKey {source_path}")
+
+    def upload_many(self, items: list[tuple[BinaryIO, str]], **kwargs: int) -> None:
+        for file_obj, source_path in items:
+            self.upload_fileobj(file_obj, source_path)
+
+    def download_many(self, source_paths: list[str], **kwargs: int) -> list[io.BytesIO]:
+        return [self.download_fileobj(source_path) for source_path in source_paths]
+
+    def iter_file_chunks(
+        self, source_path: str, chunk_size: int = 1 << 20
+    ) -> Iterator[bytes]:
+        content = self.download_fileobj(source_path).getvalue()
+        return (
+            content[start : start + chunk_size]
+            for start in range(0, len(content), chunk_size)
+        )
+
+    def exists(self, source_path: str) -> bool:
+        return source_path in self._objects
+
+    def delete_file(self, source_path: str) -> None:
+        # Like S3, deleting a missing key is not an error
+        self._objects.pop(source_path, None)
+
+    def create_bucket(self) -> None:
+        self._buckets.setdefault(self.bucket_name, {})
+
+    def empty_bucket(self, prefix: str = "") -> None:
+        objects = self._objects
+        for key in [key for key in objects if key.startswith(prefix)]:
+            del objects[key]
+
+    def delete_bucket(self) -> None:
+        self._buckets.pop(self.bucket_name, None)
@@ -0,0 +1,110 @@
+"""Tests that apply the files app's real migrations, which --nomigrations skips"""
+
+from typing import Generator
+
+import pytest
+from django.apps.registry import Apps
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import override_settings
+
+
+class Migrator:
+    """Move the test database between migration states of the files app"""
+
+    def __init__(self) -> None:
+        self.executor = MigrationExecutor(connection)
+
+    def migrate(self, target: str | None) -> Apps:
+        """Migrate the files app to target (None for zero) and return its apps"""
+        targets = [("files", target)]
+        self.executor.loader.build_graph()
+        self.executor.migrate(targets)
+        return self.executor.loader.project_state(
+            targets if target is not None else []
+        ).apps
+
+    def migrate_to_latest(self) -> None:
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.executor.loader.graph.leaf_nodes())
+
+
+@pytest.fixture
+def migrator(transactional_db: None) -> Generator[Migrator, None, None]:
+    """
+    Migrator over the real migration modules.
+    --nomigrations builds the test schema straight from the models, so every
+    migration is first recorded as applied without running it. The schema is
+    migrated back to the latest state and the records dropped afterwards.
+    SQLite can't alter tables inside the rollback-based django_db transaction,
+    hence transactional_db.
+    """
+    with override_settings(MIGRATION_MODULES={}):
+        migrator = Migrator()
+        migrator.executor.migrate(
+            migrator.executor.loader.graph.leaf_nodes(), fake=True
+        )
+        try:
+            yield migrator
+        finally:
+            migrator.migrate_to_latest()
+            migrator.executor.recorder.flush()
+
+
+def test_user_storage_backfill(migrator: Migrator) -> None:
+    """Test 0002 fills UserStorage with each user's deduplicated usage"""
+    old_apps = migrator.migrate("0001_initial")
+    FileStorage = old_apps.get_model("files", "FileStorage")
+    File = old_apps.get_model("files", "File")
+
+    shared = FileStorage.objects.create(
+        file_hash="backfill_shared", s3_path="test/shared.txt", size=1024
+    )
+    own = FileStorage.objects.create(
+        file_hash="backfill_own", s3_path="test/own.txt", size=2048
+    )
+    for user_id, storage in [
+        ("backfill_user_1", shared),
+        ("backfill_user_1", shared),
+        ("backfill_user_1", own),
+        ("backfill_user_2", shared),
+    ]:
+        File.objects.create(
+            storage=storage,
+            user_id=user_id,
+            original_filename="backfill.txt",
+            file_type="text/plain",
+        )
+
+    new_apps = migrator.migrate("0002_userstorage")
+    UserStorage = new_apps.get_model("files", "UserStorage")
+
+    # Shared storage is counted once per user
+    assert dict(UserStorage.objects.values_list("user_id", "total_bytes")) == {
+        "backfill_user_1": 3072,
+        "backfill_user_2": 1024,
+    }
+
+
+def test_migrations_apply_from_zero(migrator: Migrator) -> None:
+    """Test the whole files migration chain builds the schema the models expect"""
+    migrator.migrate(None)
+    assert "files_file" not in connection.introspection.table_names()
+
+    migrator.migrate_to_latest()
+
+    tables = connection.introspection.table_names()
+    assert {"files_filestorage", "files_file", "files_userstorage"} <= set(tables)
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, "files_file")
+    indexed_columns = [c["columns"] for c in constraints.values() if c["index"]]
+    assert ["user_id", "storage_id"] in indexed_columns
+    assert ["user_id", "file_type"] in indexed_columns
+
+
+@pytest.mark.django_db
+def test_models_match_migrations() -> None:
+    """Test no model change is missing a migration"""
+    with override_settings(MIGRATION_MODULES={}):
+        call_command("makemigrations", "files", "--check", "--dry-run", verbosity=0)
@@ -1,5 +1,9 @@
 import os
 import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 from unittest.mock import patch
 
@@ -50,9 +54,10 @@ class TestRateLimiterServiceIntegration:
         for _ in range(rate_limiter.max_calls):
             rate_limiter.add_request(test_user_id)
 
-        # Next request should fail
+        # Next request should fail, but still be traceable by its request ID
         request_id, is_allowed = rate_limiter.add_request(test_user_id)
         assert not is_allowed, "Request beyond limit should be rejected"
+        assert uuid.UUID(request_id)
 
     def test_get_current_request_count(
         self, rate_limiter: RateLimiterService, test_user_id: str
@@ -172,6 +177,24 @@ class TestRateLimiterServiceIntegration:
         successful_calls = sum(results)
         assert successful_calls == rate_limiter.max_calls
 
+    def test_concurrent_users_each_get_their_own_limit(
+        self, rate_limiter: RateLimiterService
+    ) -> None:
+        """Test concurrent calls from many users, spread across lock shards."""
+        user_ids = [f"concurrent_user_{i}" for i in range(32)]
+        attempts = [
+            user_id for user_id in user_ids for _ in range(rate_limiter.max_calls + 2)
+        ]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(rate_limiter.add_request, attempts))
+
+        allowed_per_user = Counter(
+            user_id for user_id, (_, is_allowed) in zip(attempts, results) if is_allowed
+        )
+        for user_id in user_ids:
+            assert allowed_per_user[user_id] == rate_limiter.max_calls
+
     def test_expired_requests_cleanup(
         self, rate_limiter: RateLimiterService, test_user_id: str
     ) -> None:
@@ -187,6 +210,38 @@ class TestRateLimiterServiceIntegration:
         count = rate_limiter.get_current_request_count(test_user_id)
         assert count == 0, "Expired requests should be cleaned up"
 
+    def test_sweep_drops_only_idle_windows(
+        self, rate_limiter: RateLimiterService, test_user_id: str
+    ) -> None:
+        """Test the sweep evicts users whose requests all left the window."""
+        rate_limiter.add_request("idle_user")
+        rate_limiter.add_request(test_user_id)
+        later = time.time() + rate_limiter.time_window
+
+        # Still active at the later time, so it must keep its window
+        rate_limiter.user_requests[test_user_id].timestamps[0] = later
+
+        assert rate_limiter.sweep_idle_windows(later) == 1
+        assert set(rate_limiter.user_requests) == {test_user_id}
+
+    def test_add_request_sweeps_periodically(
+        self, rate_limiter: RateLimiterService, test_user_id: str
+    ) -> None:
+        """Test idle windows are evicted by later requests, not kept forever."""
+        for index in range(100):
+            rate_limiter.add_request(f"one_off_user_{index}")
+        assert len(rate_limiter.user_requests) == 100
+
+        # Pretend the last sweep was long ago and the one-off users went idle
+        rate_limiter._last_sweep = 0.0
+        with patch(
+            "src.services.rate_limiter_service.time.time",
+            return_value=time.time() + rate_limiter.time_window,
+        ):
+            rate_limiter.add_request(test_user_id)
+
+        assert set(rate_limiter.user_requests) == {test_user_id}
+
     def test_rate_limit_info_reset_time_calculation(
         self, rate_limiter: RateLimiterService, test_user_id: str
     ) -> None:
@@ -207,4 +262,4 @@ class TestRateLimiterServiceIntegration:
 
         assert (
             expected_min <= reset_time <= expected_max
-        ), f"Reset time {reset_time} not in expected range [{expected_min}, {expected_max}]"
\ No newline at end of file
+        ), f"Reset time {reset_time} not in expected range [{expected_min}, {expected_max}]"
@@ -1,12 +1,19 @@
 import os
 import pytest
+from typing import TYPE_CHECKING
 from unittest.mock import patch
 
 from src.services.storage_limit_service import StorageLimitService, StorageQuotaInfo
 from src.files.models import File, FileStorage
 
+if TYPE_CHECKING:
+    from pytest_django import DjangoAssertNumQueries
 
-@pytest.mark.django_db
+MB = 1 << 20
+DEFAULT_LIMIT = 10 * MB  # Default TOTAL_STORAGE_LIMIT_Z_MB
+
+
+@pytest.mark.django_db(transaction=False)
 class TestStorageLimitServiceIntegration:
     """Integration tests for StorageLimitService using real database"""
 
@@ -30,14 +37,14 @@ class TestStorageLimitServiceIntegration:
     ) -> None:
         """Test storage service initializes with default environment values."""
         assert storage_service.limit_mb == 10
-        assert storage_service.limit_bytes == 10 * 1024 * 1024
+        assert storage_service.limit_bytes == DEFAULT_LIMIT
 
     @patch.dict(os.environ, {"TOTAL_STORAGE_LIMIT_Z_MB": "25"})
     def test_initialization_with_custom_env_values(self) -> None:
         """Test storage service initializes with custom environment values."""
         service = StorageLimitService()
         assert service.limit_mb == 25
-        assert service.limit_bytes == 25 * 1024 * 1024
+        assert service.limit_bytes == 25 * MB
 
     def test_get_limit_mb(self, storage_service: StorageLimitService) -> None:
         """Test getting the storage limit in MB."""
@@ -52,14 +59,17 @@ class TestStorageLimitServiceIntegration:
         assert usage == 0
 
     def test_get_user_storage_usage_with_files(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        django_assert_num_queries: "DjangoAssertNumQueries",
     ) -> None:
         """Test getting storage usage when user has files."""
         # Create file storage
         storage = FileStorage.objects.create(
             file_hash="abcd1234567890",
             s3_path="test/file1.txt",
-            size=3 * 1024 * 1024,  # 3MB
+            size=3 * MB,
         )
 
         # Create file record for user
@@ -70,16 +80,20 @@ class TestStorageLimitServiceIntegration:
             file_type="text/plain",
         )
 
-        usage = storage_service.get_user_storage_usage(test_user_id)
-        assert usage == 3 * 1024 * 1024
+        with django_assert_num_queries(1):
+            usage = storage_service.get_user_storage_usage(test_user_id)
+        assert usage == 3 * MB
 
     def test_check_storage_limit_within_limit(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        django_assert_num_queries: "DjangoAssertNumQueries",
     ) -> None:
         """Test storage limit check when within limit."""
         # Create existing files totaling 5MB
         storage = FileStorage.objects.create(
-            file_hash="existing123", s3_path="test/existing.txt", size=5 * 1024 * 1024
+            file_hash="existing123", s3_path="test/existing.txt", size=5 * MB
         )
         File.objects.create(
             storage=storage,
@@ -89,21 +103,25 @@ class TestStorageLimitServiceIntegration:
         )
 
         # Try to add 3MB (total would be 8MB, under 10MB limit)
-        additional_size = 3 * 1024 * 1024
-        is_allowed, message = storage_service.check_storage_limit(
-            test_user_id, additional_size
-        )
+        additional_size = 3 * MB
+        with django_assert_num_queries(1):
+            is_allowed, message = storage_service.check_storage_limit(
+                test_user_id, additional_size
+            )
 
         assert is_allowed is True
         assert message == ""
 
     def test_check_storage_limit_exceeds_limit(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        django_assert_num_queries: "DjangoAssertNumQueries",
     ) -> None:
         """Test storage limit check when exceeding limit."""
         # Create existing files totaling 8MB
         storage = FileStorage.objects.create(
-            file_hash="existing456", s3_path="test/large.txt", size=8 * 1024 * 1024
+            file_hash="existing456", s3_path="test/large.txt", size=8 * MB
         )
         File.objects.create(
             storage=storage,
@@ -113,21 +131,25 @@ class TestStorageLimitServiceIntegration:
         )
 
         # Try to add 5MB (total would be 13MB, over 10MB limit)
-        additional_size = 5 * 1024 * 1024
-        is_allowed, message = storage_service.check_storage_limit(
-            test_user_id, additional_size
-        )
+        additional_size = 5 * MB
+        with django_assert_num_queries(1):
+            is_allowed, message = storage_service.check_storage_limit(
+                test_user_id, additional_size
+            )
 
         assert is_allowed is False
         assert message == "Storage Quota Exceeded"
 
     def test_check_storage_limit_exactly_at_limit(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        django_assert_num_queries: "DjangoAssertNumQueries",
     ) -> None:
         """Test storage limit check when exactly at limit."""
         # Create existing files totaling 7MB
         storage = FileStorage.objects.create(
-            file_hash="existing789", s3_path="test/medium.txt", size=7 * 1024 * 1024
+            file_hash="existing789", s3_path="test/medium.txt", size=7 * MB
         )
         File.objects.create(
             storage=storage,
@@ -137,34 +159,42 @@ class TestStorageLimitServiceIntegration:
         )
 
         # Try to add exactly 3MB (total would be exactly 10MB)
-        additional_size = 3 * 1024 * 1024
-        is_allowed, message = storage_service.check_storage_limit(
-            test_user_id, additional_size
-        )
+        additional_size = 3 * MB
+        with django_assert_num_queries(1):
+            is_allowed, message = storage_service.check_storage_limit(
+                test_user_id, additional_size
+            )
 
         assert is_allowed is True
         assert message == ""
 
     def test_get_storage_quota_info_empty_usage(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        django_assert_num_queries: "DjangoAssertNumQueries",
     ) -> None:
         """Test getting quota info when user has no files."""
-        quota_info = storage_service.get_storage_quota_info(test_user_id)
+        with django_assert_num_queries(1):
+            quota_info = storage_service.get_storage_quota_info(test_user_id)
 
         assert isinstance(quota_info, StorageQuotaInfo)
         assert quota_info.user_id == test_user_id
         assert quota_info.current_usage_bytes == 0
-        assert quota_info.limit_bytes == 10 * 1024 * 1024
-        assert quota_info.available_bytes == 10 * 1024 * 1024
+        assert quota_info.limit_bytes == DEFAULT_LIMIT
+        assert quota_info.available_bytes == DEFAULT_LIMIT
         assert quota_info.usage_percentage == 0.0
 
     def test_get_storage_quota_info_partial_usage(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        django_assert_num_queries: "DjangoAssertNumQueries",
     ) -> None:
         """Test getting quota info when user has partial usage."""
         # Create files totaling 3MB (30% of 10MB limit)
         storage = FileStorage.objects.create(
-            file_hash="partial123", s3_path="test/partial.txt", size=3 * 1024 * 1024
+            file_hash="partial123", s3_path="test/partial.txt", size=3 * MB
         )
         File.objects.create(
             storage=storage,
@@ -173,21 +203,25 @@ class TestStorageLimitServiceIntegration:
             file_type="text/plain",
         )
 
-        quota_info = storage_service.get_storage_quota_info(test_user_id)
+        with django_assert_num_queries(1):
+            quota_info = storage_service.get_storage_quota_info(test_user_id)
 
         assert quota_info.user_id == test_user_id
-        assert quota_info.current_usage_bytes == 3 * 1024 * 1024
-        assert quota_info.limit_bytes == 10 * 1024 * 1024
-        assert quota_info.available_bytes == 7 * 1024 * 1024
+        assert quota_info.current_usage_bytes == 3 * MB
+        assert quota_info.limit_bytes == DEFAULT_LIMIT
+        assert quota_info.available_bytes == 7 * MB
         assert quota_info.usage_percentage == 30.0
 
     def test_get_storage_quota_info_full_usage(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        django_assert_num_queries: "DjangoAssertNumQueries",
     ) -> None:
         """Test getting quota info when user is at 100% usage."""
         # Create files totaling 10MB (100% of 10MB limit)
         storage = FileStorage.objects.create(
-            file_hash="full123", s3_path="test/full.txt", size=10 * 1024 * 1024
+            file_hash="full123", s3_path="test/full.txt", size=10 * MB
         )
         File.objects.create(
             storage=storage,
@@ -196,19 +230,23 @@ class TestStorageLimitServiceIntegration:
             file_type="text/plain",
         )
 
-        quota_info = storage_service.get_storage_quota_info(test_user_id)
+        with django_assert_num_queries(1):
+            quota_info = storage_service.get_storage_quota_info(test_user_id)
 
-        assert quota_info.current_usage_bytes == 10 * 1024 * 1024
+        assert quota_info.current_usage_bytes == 10 * MB
         assert quota_info.available_bytes == 0
         assert quota_info.usage_percentage == 100.0
 
     def test_get_storage_quota_info_over_usage(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        django_assert_num_queries: "DjangoAssertNumQueries",
     ) -> None:
         """Test getting quota info when user is over 100% usage."""
         # Create files totaling 12MB (120% of 10MB limit)
         storage = FileStorage.objects.create(
-            file_hash="over123", s3_path="test/over.txt", size=12 * 1024 * 1024
+            file_hash="over123", s3_path="test/over.txt", size=12 * MB
         )
         File.objects.create(
             storage=storage,
@@ -217,9 +255,10 @@ class TestStorageLimitServiceIntegration:
             file_type="text/plain",
         )
 
-        quota_info = storage_service.get_storage_quota_info(test_user_id)
+        with django_assert_num_queries(1):
+            quota_info = storage_service.get_storage_quota_info(test_user_id)
 
-        assert quota_info.current_usage_bytes == 12 * 1024 * 1024
+        assert quota_info.current_usage_bytes == 12 * MB
         assert quota_info.available_bytes == 0  # Can't be negative
         assert quota_info.usage_percentage == 100.0  # Capped at 100%
 
@@ -230,7 +269,7 @@ class TestStorageLimitServiceIntegration:
 
         # Create files totaling 30MB
         storage = FileStorage.objects.create(
-            file_hash="custom123", s3_path="test/custom.txt", size=30 * 1024 * 1024
+            file_hash="custom123", s3_path="test/custom.txt", size=30 * MB
         )
         File.objects.create(
             storage=storage,
@@ -242,9 +281,9 @@ class TestStorageLimitServiceIntegration:
         # With 50MB limit, 30MB usage should be 60%
         quota_info = service.get_storage_quota_info(test_user_id)
 
-        assert quota_info.limit_bytes == 50 * 1024 * 1024
-        assert quota_info.current_usage_bytes == 30 * 1024 * 1024
-        assert quota_info.available_bytes == 20 * 1024 * 1024
+        assert quota_info.limit_bytes == 50 * MB
+        assert quota_info.current_usage_bytes == 30 * MB
+        assert quota_info.available_bytes == 20 * MB
         assert quota_info.usage_percentage == 60.0
 
     def test_multiple_users_isolation(
@@ -256,7 +295,7 @@ class TestStorageLimitServiceIntegration:
         """Test that storage limits are isolated between users."""
         # Create 8MB file for user1
         storage1 = FileStorage.objects.create(
-            file_hash="user1file", s3_path="test/user1.txt", size=8 * 1024 * 1024
+            file_hash="user1file", s3_path="test/user1.txt", size=8 * MB
         )
         File.objects.create(
             storage=storage1,
@@ -267,7 +306,7 @@ class TestStorageLimitServiceIntegration:
 
         # Create 2MB file for user2
         storage2 = FileStorage.objects.create(
-            file_hash="user2file", s3_path="test/user2.txt", size=2 * 1024 * 1024
+            file_hash="user2file", s3_path="test/user2.txt", size=2 * MB
         )
         File.objects.create(
             storage=storage2,
@@ -278,12 +317,12 @@ class TestStorageLimitServiceIntegration:
 
         # Check user1 (8MB usage)
         quota_info1 = storage_service.get_storage_quota_info(test_user_id)
-        assert quota_info1.current_usage_bytes == 8 * 1024 * 1024
+        assert quota_info1.current_usage_bytes == 8 * MB
         assert quota_info1.usage_percentage == 80.0
 
         # Check user2 (2MB usage)
         quota_info2 = storage_service.get_storage_quota_info(test_user_id_2)
-        assert quota_info2.current_usage_bytes == 2 * 1024 * 1024
+        assert quota_info2.current_usage_bytes == 2 * MB
         assert quota_info2.usage_percentage == 20.0
 
     def test_multiple_files_same_user(
@@ -292,7 +331,7 @@ class TestStorageLimitServiceIntegration:
         """Test storage calculation with multiple files for same user."""
         # Create multiple files for the same user
         storage1 = FileStorage.objects.create(
-            file_hash="multi1", s3_path="test/file1.txt", size=2 * 1024 * 1024  # 2MB
+            file_hash="multi1", s3_path="test/file1.txt", size=2 * MB
         )
         File.objects.create(
             storage=storage1,
@@ -302,7 +341,7 @@ class TestStorageLimitServiceIntegration:
         )
 
         storage2 = FileStorage.objects.create(
-            file_hash="multi2", s3_path="test/file2.txt", size=3 * 1024 * 1024  # 3MB
+            file_hash="multi2", s3_path="test/file2.txt", size=3 * MB
         )
         File.objects.create(
             storage=storage2,
@@ -313,7 +352,7 @@ class TestStorageLimitServiceIntegration:
 
         # Total should be 5MB
         usage = storage_service.get_user_storage_usage(test_user_id)
-        assert usage == 5 * 1024 * 1024
+        assert usage == 5 * MB
 
         quota_info = storage_service.get_storage_quota_info(test_user_id)
         assert quota_info.usage_percentage == 50.0
@@ -330,4 +369,4 @@ class TestStorageLimitServiceIntegration:
 
         quota_info = service.get_storage_quota_info(test_user_id)
         assert quota_info.limit_bytes == 0
-        assert quota_info.usage_percentage == 0.0
\ No newline at end of file
+        assert quota_info.usage_percentage == 0.0
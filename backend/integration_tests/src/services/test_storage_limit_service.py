@@ -1,29 +1,74 @@
 import os
 import pytest
+from typing import TYPE_CHECKING, Generator
 from unittest.mock import patch
 
 from src.services.storage_limit_service import StorageLimitService, StorageQuotaInfo
-from src.files.models import File, FileStorage
+from src.files.models import File, FileStorage, UserStorage
 
+if TYPE_CHECKING:
+    from pytest_django import DjangoAssertNumQueries
 
-@pytest.mark.django_db
+TEST_USER_ID = "test_user_123"
+TEST_USER_ID_2 = "test_user_456"
+
+
+@pytest.mark.django_db(transaction=False)
 class TestStorageLimitServiceIntegration:
     """Integration tests for StorageLimitService using real database"""
 
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def storage_service(self) -> StorageLimitService:
-        """Create a fresh storage service instance for each test."""
+        """Create one storage service instance shared by the module's tests."""
         return StorageLimitService()
 
+    @pytest.fixture(autouse=True)
+    def reset_usage_cache(
+        self, storage_service: StorageLimitService
+    ) -> Generator[None, None, None]:
+        """Clear memoized usage so each test sees its own database state."""
+        yield
+        storage_service.invalidate()
+
     @pytest.fixture
     def test_user_id(self) -> str:
         """Test user ID for isolation."""
-        return "test_user_123"
+        return TEST_USER_ID
 
     @pytest.fixture
     def test_user_id_2(self) -> str:
         """Second test user ID for multi-user tests."""
-        return "test_user_456"
+        return TEST_USER_ID_2
+
+    @pytest.fixture
+    def scenario(self, request: pytest.FixtureRequest) -> list[File]:
+        """
+        Seed one FileStorage and one File per (user_id, size) pair in request.param.
+
+        Rows are inserted with one bulk_create per model instead of a create() per row;
+        File.objects.bulk_create() rebuilds the seeded users' UserStorage counters.
+        """
+        user_size_pairs: list[tuple[str, int]] = request.param
+        storages = FileStorage.objects.bulk_create(
+            FileStorage(
+                file_hash=f"scenario{index}",
+                s3_path=f"test/scenario{index}.txt",
+                size=size,
+            )
+            for index, (_, size) in enumerate(user_size_pairs)
+        )
+        files = File.objects.bulk_create(
+            File(
+                storage=storage,
+                user_id=user_id,
+                original_filename=f"scenario{index}.txt",
+                file_type="text/plain",
+            )
+            for index, (storage, (user_id, _)) in enumerate(
+                zip(storages, user_size_pairs)
+            )
+        )
+        return files
 
     def test_initialization_with_default_values(
         self, storage_service: StorageLimitService
@@ -51,99 +96,135 @@ class TestStorageLimitServiceIntegration:
         usage = storage_service.get_user_storage_usage(test_user_id)
         assert usage == 0
 
+    @pytest.mark.parametrize(
+        "scenario", [[(TEST_USER_ID, 3 * 1024 * 1024)]], indirect=True
+    )
     def test_get_user_storage_usage_with_files(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        scenario: list[File],
     ) -> None:
         """Test getting storage usage when user has files."""
-        # Create file storage
-        storage = FileStorage.objects.create(
-            file_hash="abcd1234567890",
-            s3_path="test/file1.txt",
-            size=3 * 1024 * 1024,  # 3MB
-        )
-
-        # Create file record for user
-        File.objects.create(
-            storage=storage,
-            user_id=test_user_id,
-            original_filename="file1.txt",
-            file_type="text/plain",
-        )
-
         usage = storage_service.get_user_storage_usage(test_user_id)
         assert usage == 3 * 1024 * 1024
 
+    @pytest.mark.parametrize(
+        "scenario", [[(TEST_USER_ID, 5 * 1024 * 1024)]], indirect=True
+    )
     def test_check_storage_limit_within_limit(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        scenario: list[File],
+        django_assert_num_queries: "DjangoAssertNumQueries",
     ) -> None:
         """Test storage limit check when within limit."""
-        # Create existing files totaling 5MB
-        storage = FileStorage.objects.create(
-            file_hash="existing123", s3_path="test/existing.txt", size=5 * 1024 * 1024
-        )
-        File.objects.create(
-            storage=storage,
-            user_id=test_user_id,
-            original_filename="existing.txt",
-            file_type="text/plain",
-        )
-
-        # Try to add 3MB (total would be 8MB, under 10MB limit)
+        # Existing files total 5MB; try to add 3MB (total 8MB, under 10MB limit)
         additional_size = 3 * 1024 * 1024
-        is_allowed, message = storage_service.check_storage_limit(
-            test_user_id, additional_size
-        )
+        with django_assert_num_queries(1):
+            is_allowed, message = storage_service.check_storage_limit(
+                test_user_id, additional_size
+            )
 
         assert is_allowed is True
         assert message == ""
 
+    @pytest.mark.parametrize(
+        "scenario", [[(TEST_USER_ID, 8 * 1024 * 1024)]], indirect=True
+    )
     def test_check_storage_limit_exceeds_limit(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        scenario: list[File],
+        django_assert_num_queries: "DjangoAssertNumQueries",
     ) -> None:
         """Test storage limit check when exceeding limit."""
-        # Create existing files totaling 8MB
-        storage = FileStorage.objects.create(
-            file_hash="existing456", s3_path="test/large.txt", size=8 * 1024 * 1024
-        )
-        File.objects.create(
-            storage=storage,
-            user_id=test_user_id,
-            original_filename="large.txt",
-            file_type="text/plain",
-        )
-
-        # Try to add 5MB (total would be 13MB, over 10MB limit)
+        # Existing files total 8MB; try to add 5MB (total 13MB, over 10MB limit)
         additional_size = 5 * 1024 * 1024
-        is_allowed, message = storage_service.check_storage_limit(
-            test_user_id, additional_size
-        )
+        with django_assert_num_queries(1):
+            is_allowed, message = storage_service.check_storage_limit(
+                test_user_id, additional_size
+            )
 
         assert is_allowed is False
         assert message == "Storage Quota Exceeded"
 
+    @pytest.mark.parametrize(
+        "scenario", [[(TEST_USER_ID, 7 * 1024 * 1024)]], indirect=True
+    )
     def test_check_storage_limit_exactly_at_limit(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        scenario: list[File],
+        django_assert_num_queries: "DjangoAssertNumQueries",
     ) -> None:
         """Test storage limit check when exactly at limit."""
-        # Create existing files totaling 7MB
-        storage = FileStorage.objects.create(
-            file_hash="existing789", s3_path="test/medium.txt", size=7 * 1024 * 1024
+        # Existing files total 7MB; try to add exactly 3MB (total exactly 10MB)
+        additional_size = 3 * 1024 * 1024
+        with django_assert_num_queries(1):
+            is_allowed, message = storage_service.check_storage_limit(
+                test_user_id, additional_size
+            )
+
+        assert is_allowed is True
+        assert message == ""
+
+    @pytest.mark.parametrize(
+        "scenario", [[(TEST_USER_ID, 7 * 1024 * 1024)]], indirect=True
+    )
+    def test_reserve_storage_within_limit(
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        scenario: list[File],
+    ) -> None:
+        """Test reserving storage up to exactly the limit adds it to usage."""
+        # Existing files total 7MB; reserve exactly 3MB (total exactly 10MB)
+        assert storage_service.reserve_storage(test_user_id, 3 * 1024 * 1024)
+
+        assert UserStorage.objects.get(user_id=test_user_id).total_bytes == (
+            10 * 1024 * 1024
         )
-        File.objects.create(
-            storage=storage,
-            user_id=test_user_id,
-            original_filename="medium.txt",
-            file_type="text/plain",
+        assert storage_service.get_user_storage_usage(test_user_id) == (
+            10 * 1024 * 1024
         )
 
-        # Try to add exactly 3MB (total would be exactly 10MB)
-        additional_size = 3 * 1024 * 1024
-        is_allowed, message = storage_service.check_storage_limit(
-            test_user_id, additional_size
+    @pytest.mark.parametrize(
+        "scenario", [[(TEST_USER_ID, 8 * 1024 * 1024)]], indirect=True
+    )
+    def test_reserve_storage_exceeds_limit(
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        scenario: list[File],
+    ) -> None:
+        """Test a reservation over the limit is rejected without changing usage."""
+        # Existing files total 8MB; try to reserve 5MB (total 13MB, over 10MB limit)
+        assert not storage_service.reserve_storage(test_user_id, 5 * 1024 * 1024)
+
+        assert UserStorage.objects.get(user_id=test_user_id).total_bytes == (
+            8 * 1024 * 1024
         )
 
-        assert is_allowed is True
-        assert message == ""
+    def test_reserve_storage_new_user(
+        self, storage_service: StorageLimitService, test_user_id: str
+    ) -> None:
+        """Test reserving storage for a user without a usage counter yet."""
+        assert storage_service.reserve_storage(test_user_id, 1024)
+        assert UserStorage.objects.get(user_id=test_user_id).total_bytes == 1024
+
+    def test_release_storage(
+        self, storage_service: StorageLimitService, test_user_id: str
+    ) -> None:
+        """Test releasing a reservation restores the previous usage."""
+        assert storage_service.reserve_storage(test_user_id, 2048)
+        storage_service.release_storage(test_user_id, 2048)
+
+        assert UserStorage.objects.get(user_id=test_user_id).total_bytes == 0
+        assert storage_service.get_user_storage_usage(test_user_id) == 0
 
     def test_get_storage_quota_info_empty_usage(
         self, storage_service: StorageLimitService, test_user_id: str
@@ -158,22 +239,19 @@ class TestStorageLimitServiceIntegration:
         assert quota_info.available_bytes == 10 * 1024 * 1024
         assert quota_info.usage_percentage == 0.0
 
+    @pytest.mark.parametrize(
+        "scenario", [[(TEST_USER_ID, 3 * 1024 * 1024)]], indirect=True
+    )
     def test_get_storage_quota_info_partial_usage(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        scenario: list[File],
+        django_assert_num_queries: "DjangoAssertNumQueries",
     ) -> None:
-        """Test getting quota info when user has partial usage."""
-        # Create files totaling 3MB (30% of 10MB limit)
-        storage = FileStorage.objects.create(
-            file_hash="partial123", s3_path="test/partial.txt", size=3 * 1024 * 1024
-        )
-        File.objects.create(
-            storage=storage,
-            user_id=test_user_id,
-            original_filename="partial.txt",
-            file_type="text/plain",
-        )
-
-        quota_info = storage_service.get_storage_quota_info(test_user_id)
+        """Test getting quota info when user has partial usage (3MB of 10MB)."""
+        with django_assert_num_queries(1):
+            quota_info = storage_service.get_storage_quota_info(test_user_id)
 
         assert quota_info.user_id == test_user_id
         assert quota_info.current_usage_bytes == 3 * 1024 * 1024
@@ -181,64 +259,48 @@ class TestStorageLimitServiceIntegration:
         assert quota_info.available_bytes == 7 * 1024 * 1024
         assert quota_info.usage_percentage == 30.0
 
+    @pytest.mark.parametrize(
+        "scenario", [[(TEST_USER_ID, 10 * 1024 * 1024)]], indirect=True
+    )
     def test_get_storage_quota_info_full_usage(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        scenario: list[File],
     ) -> None:
         """Test getting quota info when user is at 100% usage."""
-        # Create files totaling 10MB (100% of 10MB limit)
-        storage = FileStorage.objects.create(
-            file_hash="full123", s3_path="test/full.txt", size=10 * 1024 * 1024
-        )
-        File.objects.create(
-            storage=storage,
-            user_id=test_user_id,
-            original_filename="full.txt",
-            file_type="text/plain",
-        )
-
         quota_info = storage_service.get_storage_quota_info(test_user_id)
 
         assert quota_info.current_usage_bytes == 10 * 1024 * 1024
         assert quota_info.available_bytes == 0
         assert quota_info.usage_percentage == 100.0
 
+    @pytest.mark.parametrize(
+        "scenario", [[(TEST_USER_ID, 12 * 1024 * 1024)]], indirect=True
+    )
     def test_get_storage_quota_info_over_usage(
-        self, storage_service: StorageLimitService, test_user_id: str
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        scenario: list[File],
     ) -> None:
-        """Test getting quota info when user is over 100% usage."""
-        # Create files totaling 12MB (120% of 10MB limit)
-        storage = FileStorage.objects.create(
-            file_hash="over123", s3_path="test/over.txt", size=12 * 1024 * 1024
-        )
-        File.objects.create(
-            storage=storage,
-            user_id=test_user_id,
-            original_filename="over.txt",
-            file_type="text/plain",
-        )
-
+        """Test getting quota info when user is over 100% usage (12MB of 10MB)."""
         quota_info = storage_service.get_storage_quota_info(test_user_id)
 
         assert quota_info.current_usage_bytes == 12 * 1024 * 1024
         assert quota_info.available_bytes == 0  # Can't be negative
         assert quota_info.usage_percentage == 100.0  # Capped at 100%
 
+    @pytest.mark.parametrize(
+        "scenario", [[(TEST_USER_ID, 30 * 1024 * 1024)]], indirect=True
+    )
     @patch.dict(os.environ, {"TOTAL_STORAGE_LIMIT_Z_MB": "50"})
-    def test_different_storage_limits(self, test_user_id: str) -> None:
+    def test_different_storage_limits(
+        self, test_user_id: str, scenario: list[File]
+    ) -> None:
         """Test that different storage limits work correctly."""
         service = StorageLimitService()
 
-        # Create files totaling 30MB
-        storage = FileStorage.objects.create(
-            file_hash="custom123", s3_path="test/custom.txt", size=30 * 1024 * 1024
-        )
-        File.objects.create(
-            storage=storage,
-            user_id=test_user_id,
-            original_filename="custom.txt",
-            file_type="text/plain",
-        )
-
         # With 50MB limit, 30MB usage should be 60%
         quota_info = service.get_storage_quota_info(test_user_id)
 
@@ -247,76 +309,199 @@ class TestStorageLimitServiceIntegration:
         assert quota_info.available_bytes == 20 * 1024 * 1024
         assert quota_info.usage_percentage == 60.0
 
+    @pytest.mark.parametrize(
+        "scenario",
+        [[(TEST_USER_ID, 8 * 1024 * 1024), (TEST_USER_ID_2, 2 * 1024 * 1024)]],
+        indirect=True,
+    )
     def test_multiple_users_isolation(
         self,
         storage_service: StorageLimitService,
         test_user_id: str,
         test_user_id_2: str,
+        scenario: list[File],
+        django_assert_num_queries: "DjangoAssertNumQueries",
     ) -> None:
         """Test that storage limits are isolated between users."""
-        # Create 8MB file for user1
-        storage1 = FileStorage.objects.create(
-            file_hash="user1file", s3_path="test/user1.txt", size=8 * 1024 * 1024
-        )
-        File.objects.create(
-            storage=storage1,
-            user_id=test_user_id,
-            original_filename="user1.txt",
-            file_type="text/plain",
-        )
-
-        # Create 2MB file for user2
-        storage2 = FileStorage.objects.create(
-            file_hash="user2file", s3_path="test/user2.txt", size=2 * 1024 * 1024
-        )
-        File.objects.create(
-            storage=storage2,
-            user_id=test_user_id_2,
-            original_filename="user2.txt",
-            file_type="text/plain",
-        )
+        # Both users' usage is fetched in a single query
+        with django_assert_num_queries(1):
+            usage = storage_service.get_bulk_user_storage_usage(
+                [test_user_id, test_user_id_2]
+            )
+        assert usage == {
+            test_user_id: 8 * 1024 * 1024,
+            test_user_id_2: 2 * 1024 * 1024,
+        }
+
+        # Quota info is then served from the memoized usage
+        with django_assert_num_queries(0):
+            quota_info1 = storage_service.get_storage_quota_info(test_user_id)
+            quota_info2 = storage_service.get_storage_quota_info(test_user_id_2)
 
         # Check user1 (8MB usage)
-        quota_info1 = storage_service.get_storage_quota_info(test_user_id)
         assert quota_info1.current_usage_bytes == 8 * 1024 * 1024
         assert quota_info1.usage_percentage == 80.0
 
         # Check user2 (2MB usage)
-        quota_info2 = storage_service.get_storage_quota_info(test_user_id_2)
         assert quota_info2.current_usage_bytes == 2 * 1024 * 1024
         assert quota_info2.usage_percentage == 20.0
 
+    def test_bulk_user_storage_usage_includes_users_without_files(
+        self, storage_service: StorageLimitService, test_user_id: str
+    ) -> None:
+        """Test that users without files are reported with zero usage."""
+        assert storage_service.get_bulk_user_storage_usage([test_user_id]) == {
+            test_user_id: 0
+        }
+
+    @pytest.mark.parametrize(
+        "scenario",
+        [[(TEST_USER_ID, 2 * 1024 * 1024), (TEST_USER_ID, 3 * 1024 * 1024)]],
+        indirect=True,
+    )
     def test_multiple_files_same_user(
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        scenario: list[File],
+        django_assert_num_queries: "DjangoAssertNumQueries",
+    ) -> None:
+        """Test storage calculation with multiple files (2MB + 3MB) for same user."""
+        # Total should be 5MB, computed in a single aggregate query
+        with django_assert_num_queries(1):
+            usage = storage_service.get_user_storage_usage(test_user_id)
+        assert usage == 5 * 1024 * 1024
+
+        quota_info = storage_service.get_storage_quota_info(test_user_id)
+        assert quota_info.usage_percentage == 50.0
+
+    @pytest.mark.parametrize(
+        "scenario", [[(TEST_USER_ID, 4 * 1024 * 1024)]], indirect=True
+    )
+    def test_usage_is_memoized_across_quota_calls(
+        self,
+        storage_service: StorageLimitService,
+        test_user_id: str,
+        scenario: list[File],
+        django_assert_num_queries: "DjangoAssertNumQueries",
+    ) -> None:
+        """Test that back-to-back quota calls for the same user share one query."""
+        with django_assert_num_queries(1):
+            is_allowed, _ = storage_service.check_storage_limit(
+                test_user_id, 1024 * 1024
+            )
+            quota_info = storage_service.get_storage_quota_info(test_user_id)
+
+        assert is_allowed is True
+        assert quota_info.current_usage_bytes == 4 * 1024 * 1024
+
+    def test_invalidate_refreshes_usage(
         self, storage_service: StorageLimitService, test_user_id: str
     ) -> None:
-        """Test storage calculation with multiple files for same user."""
-        # Create multiple files for the same user
-        storage1 = FileStorage.objects.create(
-            file_hash="multi1", s3_path="test/file1.txt", size=2 * 1024 * 1024  # 2MB
+        """Test that invalidate forces usage to be recalculated."""
+        assert storage_service.get_user_storage_usage(test_user_id) == 0
+
+        storage = FileStorage.objects.create(
+            file_hash="invalidate123", s3_path="test/invalidate.txt", size=1024
         )
         File.objects.create(
-            storage=storage1,
+            storage=storage,
             user_id=test_user_id,
-            original_filename="file1.txt",
+            original_filename="invalidate.txt",
             file_type="text/plain",
         )
 
-        storage2 = FileStorage.objects.create(
-            file_hash="multi2", s3_path="test/file2.txt", size=3 * 1024 * 1024  # 3MB
+        # Cached value is served until invalidated
+        assert storage_service.get_user_storage_usage(test_user_id) == 0
+        storage_service.invalidate(test_user_id)
+        assert storage_service.get_user_storage_usage(test_user_id) == 1024
+
+    def test_user_storage_counter_deduplicates_shared_storage(
+        self, test_user_id: str, test_user_id_2: str
+    ) -> None:
+        """Test the UserStorage counter counts shared storage once per user."""
+        storage = FileStorage.objects.create(
+            file_hash="counter123", s3_path="test/counter.txt", size=1024
         )
-        File.objects.create(
-            storage=storage2,
+        first = File.objects.create(
+            storage=storage,
             user_id=test_user_id,
-            original_filename="file2.txt",
+            original_filename="counter.txt",
             file_type="text/plain",
         )
+        second = File.objects.create(
+            storage=storage,
+            user_id=test_user_id,
+            original_filename="counter_copy.txt",
+            file_type="text/plain",
+            is_duplicate=True,
+        )
+        File.objects.create(
+            storage=storage,
+            user_id=test_user_id_2,
+            original_filename="counter.txt",
+            file_type="text/plain",
+            is_duplicate=True,
+        )
 
-        # Total should be 5MB
-        usage = storage_service.get_user_storage_usage(test_user_id)
-        assert usage == 5 * 1024 * 1024
+        assert UserStorage.objects.get(user_id=test_user_id).total_bytes == 1024
+        assert UserStorage.objects.get(user_id=test_user_id_2).total_bytes == 1024
 
-        quota_info = storage_service.get_storage_quota_info(test_user_id)
-        assert quota_info.usage_percentage == 50.0
+        # Deleting one of two references keeps the storage counted
+        second.delete()
+        assert UserStorage.objects.get(user_id=test_user_id).total_bytes == 1024
+
+        # Deleting the last reference releases it
+        first.delete()
+        assert UserStorage.objects.get(user_id=test_user_id).total_bytes == 0
+        assert UserStorage.objects.get(user_id=test_user_id_2).total_bytes == 1024
+
+    def test_bulk_writes_keep_counter_in_sync(
+        self, test_user_id: str, test_user_id_2: str
+    ) -> None:
+        """Test bulk_create and QuerySet.delete rebuild the users' counters."""
+        storage = FileStorage.objects.create(
+            file_hash="bulk123", s3_path="test/bulk.txt", size=1024
+        )
+        File.objects.bulk_create(
+            File(
+                storage=storage,
+                user_id=user_id,
+                original_filename="bulk.txt",
+                file_type="text/plain",
+            )
+            for user_id in (test_user_id, test_user_id, test_user_id_2)
+        )
+
+        assert UserStorage.objects.get(user_id=test_user_id).total_bytes == 1024
+        assert UserStorage.objects.get(user_id=test_user_id_2).total_bytes == 1024
+
+        File.objects.filter(user_id=test_user_id).delete()
+
+        assert UserStorage.objects.get(user_id=test_user_id).total_bytes == 0
+        assert UserStorage.objects.get(user_id=test_user_id_2).total_bytes == 1024
+
+    def test_user_storage_rebuild_matches_counter(self, test_user_id: str) -> None:
+        """Test rebuilding a counter reproduces the incrementally maintained value."""
+        for index, size in enumerate([1024, 2048]):
+            storage = FileStorage.objects.create(
+                file_hash=f"rebuild{index}",
+                s3_path=f"test/rebuild{index}.txt",
+                size=size,
+            )
+            File.objects.create(
+                storage=storage,
+                user_id=test_user_id,
+                original_filename=f"rebuild{index}.txt",
+                file_type="text/plain",
+            )
+        maintained = UserStorage.objects.get(user_id=test_user_id).total_bytes
+
+        UserStorage.objects.filter(user_id=test_user_id).update(total_bytes=0)
+        UserStorage.rebuild([test_user_id])
+
+        assert maintained == 3072
+        assert UserStorage.objects.get(user_id=test_user_id).total_bytes == maintained
 
     @patch.dict(os.environ, {"TOTAL_STORAGE_LIMIT_Z_MB": "0"})
     def test_zero_limit_edge_case(self, test_user_id: str) -> None:
@@ -330,4 +515,4 @@ class TestStorageLimitServiceIntegration:
 
         quota_info = service.get_storage_quota_info(test_user_id)
         assert quota_info.limit_bytes == 0
-        assert quota_info.usage_percentage == 0.0
\ No newline at end of file
+        assert quota_info.usage_percentage == 0.0
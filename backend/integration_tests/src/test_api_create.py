@@ -3,23 +3,38 @@
 
 import os
 import uuid
+import warnings
 import pytest
-import django
 from pytest import MonkeyPatch
 from rest_framework.test import APIRequestFactory
 from django.core.files.uploadedfile import SimpleUploadedFile
 from src.files.serializers import FileSerializer
-from src.files.views import FileViewSet  # noqa: E402
-from src.files.models import File, FileStorage  # noqa: E402
-from src.services.s3_file_service import S3FileService  # noqa: E402
-from src.services.storage_limit_service import StorageLimitService  # noqa: E402
+from src.files.views import FileViewSet
+from src.files.models import File, FileStorage
+from src.services.s3_file_service import S3FileService
+from src.services.storage_limit_service import StorageLimitService
 
-# Configure Django settings
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.core.settings")
-django.setup()
+MB = 1 << 20
+DEFAULT_LIMIT = 10 * MB  # Default TOTAL_STORAGE_LIMIT_Z_MB
+
+# Fields every serialized file must expose per the API spec
+REQUIRED_FIELDS = frozenset(
+    {
+        "id",
+        "file",
+        "original_filename",
+        "file_type",
+        "size",
+        "user_id",
+        "file_hash",
+        "reference_count",
+        "is_reference",
+        "original_file",
+    }
+)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def s3_credentials() -> dict[str, str]:
     """Get MinIO credentials from environment variables"""
     return {
@@ -30,15 +45,15 @@ def s3_credentials() -> dict[str, str]:
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def test_bucket_name() -> str:
-    """Generate unique bucket name for test isolation"""
+    """Generate one unique bucket name for the test session"""
     return f"test-api-{uuid.uuid4().hex[:8]}"
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def s3_service(s3_credentials: dict[str, str], test_bucket_name: str):
-    """Create real S3FileService instance with MinIO credentials and test bucket"""
+    """Create real S3FileService instance with MinIO credentials and a session-wide test bucket"""
     service = S3FileService(
         bucket_name=test_bucket_name,
         aws_access_key_id=s3_credentials["aws_access_key_id"],
@@ -56,7 +71,7 @@ def s3_service(s3_credentials: dict[str, str], test_bucket_name: str):
     try:
         service.delete_bucket()
     except Exception as e:
-        print(f"Warning: Failed to cleanup test bucket: {e}")
+        warnings.warn(f"Failed to cleanup test bucket: {e}", stacklevel=2)
 
 
 # No custom database fixture needed - pytest-django handles this
@@ -102,13 +117,21 @@ def test_storage_limit(
     monkeypatch.setenv("AWS_ENDPOINT_URL", s3_credentials["endpoint_url"])
     monkeypatch.setenv("AWS_REGION", s3_credentials["region_name"])
 
-    factory = APIRequestFactory()
-    # Create file larger than 10MB
-    large_content = b"x" * (11 * 1024 * 1024)  # 11MB
-    uploaded_file = SimpleUploadedFile(
-        "large.txt", large_content, content_type="text/plain"
+    # Fill the user's 10MB quota via a storage record instead of uploading
+    # (and allocating) a payload larger than the limit
+    storage = FileStorage.objects.create(
+        file_hash="quota_filler_hash", s3_path="test/filler.txt", size=10 * MB
+    )
+    File.objects.create(
+        storage=storage,
+        user_id="test_user_123",
+        original_filename="filler.txt",
+        file_type="text/plain",
     )
 
+    factory = APIRequestFactory()
+    uploaded_file = SimpleUploadedFile("small.txt", b"x", content_type="text/plain")
+
     request = factory.post("/files/", {"file": uploaded_file})
     request.headers = {"UserId": "test_user_123"}
 
@@ -117,8 +140,9 @@ def test_storage_limit(
 
     assert response.status_code == 429
     assert "Storage Quota Exceeded" in response.data["error"]
-    assert response.data["limit_bytes"] == 10 * 1024 * 1024
-    assert response.data["attempted_upload_bytes"] == 11 * 1024 * 1024
+    assert response.data["current_usage_bytes"] == 10 * MB
+    assert response.data["limit_bytes"] == DEFAULT_LIMIT
+    assert response.data["attempted_upload_bytes"] == 1
 
 
 @pytest.mark.django_db
@@ -144,21 +168,8 @@ def test_serializer_with_db() -> None:
     data = serializer.data
 
     # Check required fields from API spec
-    required_fields = [
-        "id",
-        "file",
-        "original_filename",
-        "file_type",
-        "size",
-        "user_id",
-        "file_hash",
-        "reference_count",
-        "is_reference",
-        "original_file",
-    ]
-
-    for field in required_fields:
-        assert field in data, f"Missing field: {field}"
+    missing = REQUIRED_FIELDS - data.keys()
+    assert not missing, f"Missing fields: {missing}"
 
     assert data["file_hash"] == "abcd1234567890"
     assert data["user_id"] == "test_user"
@@ -212,7 +223,7 @@ def test_user_storage_methods() -> None:
 
     # Test storage limits (user1 has used 3000 bytes, limit is 10MB = 10,485,760 bytes)
     # So user1 can upload about 10MB - 3KB more
-    remaining = (10 * 1024 * 1024) - 3000  # About 10MB - 3KB
+    remaining = DEFAULT_LIMIT - 3000  # About 10MB - 3KB
     is_allowed_1, _ = storage_service.check_storage_limit("user1", remaining - 1000)
     is_allowed_2, _ = storage_service.check_storage_limit("user1", remaining + 1000)
     assert is_allowed_1  # Should fit
@@ -3,22 +3,52 @@
 
 import os
 import uuid
+import warnings
 import pytest
-import django
+from typing import Callable, Generator
+from django.db import connection
+from django.db.models import F, QuerySet
 from rest_framework.test import APIRequestFactory
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.wsgi import WSGIRequest
 from pytest import MonkeyPatch
+from rest_framework.response import Response
 
-# Configure Django settings
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.core.settings")
-django.setup()
-from src.files.views import FileViewSet  # noqa: E402
-from src.files.models import File, FileStorage  # noqa: E402
-from src.services.s3_file_service import S3FileService  # noqa: E402
-from src.services.storage_limit_service import StorageLimitService  # noqa: E402
+from src.files.models import File, FileStorage
+from src.services.s3_file_service import S3FileService
+from src.services.storage_limit_service import StorageLimitService
 
+# Minimal upload payload; no test here depends on the content itself
+TINY = b"x"
 
-@pytest.fixture
+
+def rows_exist(*querysets: QuerySet) -> tuple[bool, ...]:
+    """Evaluate several .exists() checks in a single SELECT EXISTS(...), ... query"""
+    subqueries = [
+        qs.order_by().values("pk")[:1].query.sql_with_params() for qs in querysets
+    ]
+    sql = "SELECT " + ", ".join(f"EXISTS({subquery})" for subquery, _ in subqueries)
+    params = [param for _, subquery_params in subqueries for param in subquery_params]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return tuple(bool(value) for value in cursor.fetchone())
+
+
+def delete_request(factory: APIRequestFactory, path: str, user_id: str) -> WSGIRequest:
+    """Build a DELETE request carrying the UserId header through the WSGI environ"""
+    return factory.delete(path, HTTP_USERID=user_id)
+
+
+def ref_count(storage_id: uuid.UUID | str) -> int | None:
+    """Read a storage's reference_count with a single-column query"""
+    return (
+        FileStorage.objects.filter(id=storage_id)
+        .values_list("reference_count", flat=True)
+        .first()
+    )
+
+
+@pytest.fixture(scope="session")
 def s3_credentials() -> dict[str, str]:
     """Get MinIO credentials from environment variables"""
     return {
@@ -29,15 +59,25 @@ def s3_credentials() -> dict[str, str]:
     }
 
 
-@pytest.fixture
-def test_bucket_name() -> str:
-    """Generate unique bucket name for test isolation"""
+@pytest.fixture(scope="session")
+def test_bucket_name(pytestconfig: pytest.Config, worker_id: str) -> str:
+    """
+    Generate one unique bucket name for the test session, or a stable per-worker
+    name under --reuse-bucket so the bucket survives between runs
+    """
+    if pytestconfig.getoption("reuse_bucket"):
+        return f"test-delete-reuse-{worker_id}"
     return f"test-delete-{uuid.uuid4().hex[:8]}"
 
 
-@pytest.fixture
-def s3_service(s3_credentials: dict[str, str], test_bucket_name: str) -> S3FileService:
-    """Create real S3FileService instance with MinIO credentials and test bucket"""
+@pytest.fixture(scope="session")
+def s3_service(
+    s3_credentials: dict[str, str], test_bucket_name: str, pytestconfig: pytest.Config
+) -> Generator[S3FileService, None, None]:
+    """
+    Create real S3FileService instance with MinIO credentials and a session-wide test bucket.
+    For fast runs, point this at a MinIO whose /data is a tmpfs (see README Testing).
+    """
     service = S3FileService(
         bucket_name=test_bucket_name,
         aws_access_key_id=s3_credentials["aws_access_key_id"],
@@ -46,24 +86,49 @@ def s3_service(s3_credentials: dict[str, str], test_bucket_name: str) -> S3FileS
         region_name=s3_credentials["region_name"],
     )
 
-    # Create the test bucket
+    reuse_bucket = pytestconfig.getoption("reuse_bucket")
+
+    # Create the test bucket (a no-op if a reused bucket already exists)
     service.create_bucket()
+    if reuse_bucket:
+        # Drop anything left behind by an interrupted previous run
+        service.empty_bucket()
 
     yield service
 
+    if reuse_bucket:
+        return
+
     # Cleanup: delete the test bucket and all its contents
     try:
         service.delete_bucket()
     except Exception as e:
-        print(f"Warning: Failed to cleanup test bucket: {e}")
+        warnings.warn(f"Failed to cleanup test bucket: {e}", stacklevel=2)
+
+
+@pytest.fixture
+def key_prefix(s3_service: S3FileService) -> Generator[str, None, None]:
+    """Unique object key prefix for one test; its objects are removed afterwards"""
+    prefix = f"{uuid.uuid4().hex}/"
+
+    yield prefix
+
+    try:
+        s3_service.empty_bucket(prefix=prefix)
+    except Exception as e:
+        warnings.warn(f"Failed to clean up test objects: {e}", stacklevel=2)
 
 
 @pytest.fixture
 def setup_test_environment(
     s3_service: S3FileService,
+    key_prefix: str,
     s3_credentials: dict[str, str],
     test_bucket_name: str,
     monkeypatch: MonkeyPatch,
+    create_view: Callable[..., Response],
+    delete_view: Callable[..., Response],
+    retrieve_view: Callable[..., Response],
 ) -> dict[str, any]:
     """Setup environment variables for tests"""
     monkeypatch.setenv("AWS_BUCKET_NAME", test_bucket_name)
@@ -71,11 +136,9 @@ def setup_test_environment(
     monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", s3_credentials["aws_secret_access_key"])
     monkeypatch.setenv("AWS_ENDPOINT_URL", s3_credentials["endpoint_url"])
     monkeypatch.setenv("AWS_REGION", s3_credentials["region_name"])
+    monkeypatch.setenv("AWS_KEY_PREFIX", key_prefix)
 
     factory = APIRequestFactory()
-    create_view = FileViewSet.as_view({"post": "create"})
-    delete_view = FileViewSet.as_view({"delete": "destroy"})
-    retrieve_view = FileViewSet.as_view({"get": "retrieve"})
 
     return {
         "factory": factory,
@@ -87,9 +150,10 @@ def setup_test_environment(
 
 
 @pytest.mark.django_db
-def test_delete_file_userid_required(setup_test_environment: dict[str, any]) -> None:
+def test_delete_file_userid_required(delete_view: Callable[..., Response]) -> None:
     """Test that UserId header is required for file deletion"""
-    env = setup_test_environment
+    # No upload or S3 access needed; dispatch to the view without the bucket fixtures
+    factory = APIRequestFactory()
 
     # Create a test file in database directly
     storage = FileStorage.objects.create(
@@ -105,8 +169,8 @@ def test_delete_file_userid_required(setup_test_environment: dict[str, any]) ->
     )
 
     # Request without UserId header
-    request = env["factory"].delete(f"/files/{file_obj.id}/")
-    response = env["delete_view"](request, pk=str(file_obj.id))
+    request = factory.delete(f"/files/{file_obj.id}/")
+    response = delete_view(request, pk=str(file_obj.id))
 
     assert response.status_code == 400
     assert "UserId header is required" in response.data["error"]
@@ -119,7 +183,7 @@ def test_delete_file_success(setup_test_environment: dict[str, any]) -> None:
     user_id = "test_user_delete"
 
     # Upload a file first
-    file_content = b"Test content for deletion"
+    file_content = TINY
     uploaded_file = SimpleUploadedFile(
         "test.txt", file_content, content_type="text/plain"
     )
@@ -130,23 +194,24 @@ def test_delete_file_success(setup_test_environment: dict[str, any]) -> None:
     assert upload_response.status_code == 201
     file_id = upload_response.data["id"]
 
-    # Verify file exists
-    assert File.objects.filter(id=file_id).exists()
-    storage_id = File.objects.get(id=file_id).storage.id
+    # Verify file and its storage exist
+    storage_id = (
+        File.objects.filter(id=file_id).values_list("storage_id", flat=True).first()
+    )
+    assert storage_id is not None
     assert FileStorage.objects.filter(id=storage_id).exists()
 
     # Delete the file
-    request = env["factory"].delete(f"/files/{file_id}/")
-    request.headers = {"UserId": user_id}
+    request = delete_request(env["factory"], f"/files/{file_id}/", user_id)
     response = env["delete_view"](request, pk=file_id)
 
     assert response.status_code == 204
     assert response.data is None
 
-    # Verify file is deleted
-    assert not File.objects.filter(id=file_id).exists()
-    # Storage should also be deleted since reference count was 1
-    assert not FileStorage.objects.filter(id=storage_id).exists()
+    # Verify file is deleted; storage should also be deleted since reference count was 1
+    assert rows_exist(
+        File.objects.filter(id=file_id), FileStorage.objects.filter(id=storage_id)
+    ) == (False, False)
 
 
 @pytest.mark.django_db
@@ -155,7 +220,7 @@ def test_delete_file_user_isolation(setup_test_environment: dict[str, any]) -> N
     env = setup_test_environment
 
     # Upload file as user1
-    file_content = b"User1 private content"
+    file_content = TINY
     uploaded_file = SimpleUploadedFile(
         "user1_file.txt", file_content, content_type="text/plain"
     )
@@ -167,8 +232,7 @@ def test_delete_file_user_isolation(setup_test_environment: dict[str, any]) -> N
     file_id = upload_response.data["id"]
 
     # Try to delete as user2
-    request = env["factory"].delete(f"/files/{file_id}/")
-    request.headers = {"UserId": "user2"}
+    request = delete_request(env["factory"], f"/files/{file_id}/", "user2")
     response = env["delete_view"](request, pk=file_id)
 
     # Should return 404 to not leak file existence
@@ -180,23 +244,18 @@ def test_delete_file_user_isolation(setup_test_environment: dict[str, any]) -> N
 
 
 @pytest.mark.django_db
-def test_delete_nonexistent_file(setup_test_environment: dict[str, any]) -> None:
+def test_delete_nonexistent_file(delete_view: Callable[..., Response]) -> None:
     """Test deletion of non-existent file returns 404"""
-    env = setup_test_environment
+    # No upload or S3 access needed; dispatch to the view without the bucket fixtures
+    factory = APIRequestFactory()
 
     # Try to delete a non-existent file
     fake_id = str(uuid.uuid4())
-    request = env["factory"].delete(f"/files/{fake_id}/")
-    request.headers = {"UserId": "test_user"}
+    request = delete_request(factory, f"/files/{fake_id}/", "test_user")
 
-    # DRF's get_object() will raise Http404, which should be handled
-    try:
-        response = env["delete_view"](request, pk=fake_id)
-        # If we get here, it should be a 404 response
-        assert response.status_code == 404
-    except Exception:
-        # If an exception is raised, that's also acceptable for non-existent files
-        pass
+    # DRF converts the Http404 raised by get_object() into a 404 response
+    response = delete_view(request, pk=fake_id)
+    assert response.status_code == 404
 
 
 @pytest.mark.django_db
@@ -206,7 +265,7 @@ def test_delete_file_with_references(setup_test_environment: dict[str, any]) ->
     user_id = "test_user_refs"
 
     # Upload original file
-    file_content = b"Content for reference test"
+    file_content = TINY
     original_file = SimpleUploadedFile(
         "original.txt", file_content, content_type="text/plain"
     )
@@ -217,65 +276,115 @@ def test_delete_file_with_references(setup_test_environment: dict[str, any]) ->
     assert upload_response1.status_code == 201
     original_file_id = upload_response1.data["id"]
 
-    # Upload duplicate file (same content)
-    duplicate_file = SimpleUploadedFile(
-        "duplicate.txt", file_content, content_type="text/plain"
+    # Add a duplicate reference to the same storage directly (deduplicated uploads
+    # are covered by the create tests; only reference counting matters here)
+    storage_id = (
+        File.objects.filter(id=original_file_id)
+        .values_list("storage_id", flat=True)
+        .first()
+    )
+    duplicate_file_id = File.objects.create(
+        storage_id=storage_id,
+        user_id=user_id,
+        original_filename="duplicate.txt",
+        file_type="text/plain",
+        is_duplicate=True,
+    ).id
+    FileStorage.objects.filter(id=storage_id).update(
+        reference_count=F("reference_count") + 1
     )
-    upload_request2 = env["factory"].post("/files/", {"file": duplicate_file})
-    upload_request2.headers = {"UserId": user_id}
-    upload_response2 = env["create_view"](upload_request2)
-
-    assert upload_response2.status_code == 201
-    duplicate_file_id = upload_response2.data["id"]
-
-    # Both files should reference the same storage
-    original_file_obj = File.objects.get(id=original_file_id)
-    duplicate_file_obj = File.objects.get(id=duplicate_file_id)
-    assert original_file_obj.storage.id == duplicate_file_obj.storage.id
-    storage_id = original_file_obj.storage.id
 
     # Verify reference count is 2
-    storage = FileStorage.objects.get(id=storage_id)
-    assert storage.reference_count == 2
+    assert ref_count(storage_id) == 2
 
     # Delete one file
-    request = env["factory"].delete(f"/files/{duplicate_file_id}/")
-    request.headers = {"UserId": user_id}
+    request = delete_request(env["factory"], f"/files/{duplicate_file_id}/", user_id)
     response = env["delete_view"](request, pk=duplicate_file_id)
 
     assert response.status_code == 204
 
     # Verify the File record is deleted but storage remains
-    assert not File.objects.filter(id=duplicate_file_id).exists()
-    assert File.objects.filter(id=original_file_id).exists()
-    assert FileStorage.objects.filter(id=storage_id).exists()
+    assert rows_exist(
+        File.objects.filter(id=duplicate_file_id),
+        File.objects.filter(id=original_file_id),
+        FileStorage.objects.filter(id=storage_id),
+    ) == (False, True, True)
 
     # Verify reference count is decremented
-    storage.refresh_from_db()
-    assert storage.reference_count == 1
+    assert ref_count(storage_id) == 1
 
     # Delete the second file
-    request = env["factory"].delete(f"/files/{original_file_id}/")
-    request.headers = {"UserId": user_id}
+    request = delete_request(env["factory"], f"/files/{original_file_id}/", user_id)
     response = env["delete_view"](request, pk=original_file_id)
 
     assert response.status_code == 204
 
     # Now both File record and storage should be deleted
-    assert not File.objects.filter(id=original_file_id).exists()
-    assert not FileStorage.objects.filter(id=storage_id).exists()
+    assert rows_exist(
+        File.objects.filter(id=original_file_id),
+        FileStorage.objects.filter(id=storage_id),
+    ) == (False, False)
+
+
+@pytest.mark.django_db
+def test_delete_file_keeps_concurrent_reference_increment(
+    setup_test_environment: dict[str, any], monkeypatch: MonkeyPatch
+) -> None:
+    """Test a duplicate upload landing mid-delete isn't overwritten by a stale count"""
+    env = setup_test_environment
+    user_id = "test_user_concurrent_ref"
+
+    upload_request = env["factory"].post(
+        "/files/",
+        {"file": SimpleUploadedFile("race.txt", TINY, content_type="text/plain")},
+    )
+    upload_request.headers = {"UserId": user_id}
+    upload_response = env["create_view"](upload_request)
+
+    assert upload_response.status_code == 201
+    file_id = upload_response.data["id"]
+    storage_id = (
+        File.objects.filter(id=file_id).values_list("storage_id", flat=True).first()
+    )
+
+    # Another user's duplicate upload commits after the view has loaded the storage
+    original_delete = File.delete
+
+    def delete_with_concurrent_upload(self: File, *args, **kwargs):
+        File.objects.create(
+            storage_id=storage_id,
+            user_id="test_user_concurrent_ref_2",
+            original_filename="race.txt",
+            file_type="text/plain",
+            is_duplicate=True,
+        )
+        FileStorage.objects.filter(id=storage_id).update(
+            reference_count=F("reference_count") + 1
+        )
+        return original_delete(self, *args, **kwargs)
+
+    monkeypatch.setattr(File, "delete", delete_with_concurrent_upload)
+
+    request = delete_request(env["factory"], f"/files/{file_id}/", user_id)
+    response = env["delete_view"](request, pk=file_id)
+
+    assert response.status_code == 204
+
+    # The concurrent reference survives, so the storage is kept
+    assert ref_count(storage_id) == 1
 
 
 @pytest.mark.django_db
 def test_delete_file_storage_usage_update(
     setup_test_environment: dict[str, any],
+    storage_service: StorageLimitService,
 ) -> None:
     """Test that deleting files updates storage usage calculations correctly"""
     env = setup_test_environment
     user_id = "test_user_storage"
 
     # Upload a file
-    file_content = b"Content for storage test"
+    file_content = TINY
     uploaded_file = SimpleUploadedFile(
         "storage_test.txt", file_content, content_type="text/plain"
     )
@@ -286,39 +395,34 @@ def test_delete_file_storage_usage_update(
     assert upload_response.status_code == 201
     file_id = upload_response.data["id"]
 
-    storage_service = StorageLimitService()
+    storage_service.invalidate(user_id)
     initial_usage = storage_service.get_user_storage_usage(user_id)
-    assert initial_usage == len(file_content)
+    assert initial_usage == len(TINY)
 
     # Delete the file
-    request = env["factory"].delete(f"/files/{file_id}/")
-    request.headers = {"UserId": user_id}
+    request = delete_request(env["factory"], f"/files/{file_id}/", user_id)
     response = env["delete_view"](request, pk=file_id)
 
     assert response.status_code == 204
 
     # Check storage usage after deletion
+    storage_service.invalidate(user_id)
     final_usage = storage_service.get_user_storage_usage(user_id)
     assert final_usage == 0
 
 
 @pytest.mark.django_db
-def test_delete_file_invalid_uuid(setup_test_environment: dict[str, any]) -> None:
+def test_delete_file_invalid_uuid(delete_view: Callable[..., Response]) -> None:
     """Test deleting file with invalid UUID format"""
-    env = setup_test_environment
+    # No upload or S3 access needed; dispatch to the view without the bucket fixtures
+    factory = APIRequestFactory()
 
     # Try to delete with invalid UUID
-    request = env["factory"].delete("/files/invalid-uuid/")
-    request.headers = {"UserId": "test_user"}
+    request = delete_request(factory, "/files/invalid-uuid/", "test_user")
 
-    # DRF will handle invalid UUID format and typically return 404 or validation error
-    try:
-        response = env["delete_view"](request, pk="invalid-uuid")
-        # If we get here, it should be an error response
-        assert response.status_code in [400, 404]
-    except Exception:
-        # If an exception is raised for invalid UUID, that's also acceptable
-        pass
+    # get_object_or_404 treats a malformed UUID like a missing row, so DRF returns 404
+    response = delete_view(request, pk="invalid-uuid")
+    assert response.status_code == 404
 
 
 @pytest.mark.django_db
@@ -328,7 +432,7 @@ def test_delete_file_s3_cleanup(setup_test_environment: dict[str, any]) -> None:
     user_id = "test_user_s3_cleanup"
 
     # Upload a file
-    file_content = b"S3 cleanup test content"
+    file_content = TINY
     uploaded_file = SimpleUploadedFile(
         "s3_test.txt", file_content, content_type="text/plain"
     )
@@ -340,33 +444,25 @@ def test_delete_file_s3_cleanup(setup_test_environment: dict[str, any]) -> None:
     file_id = upload_response.data["id"]
 
     # Get the S3 path for verification
-    file_obj = File.objects.get(id=file_id)
-    s3_path = file_obj.storage.s3_path
-
-    # Verify file exists in S3 (by trying to download it)
-    try:
-        env["s3_service"].download_fileobj(s3_path)
-        file_exists_in_s3 = True
-    except Exception:
-        file_exists_in_s3 = False
+    s3_path = (
+        File.objects.filter(id=file_id)
+        .values_list("storage__s3_path", flat=True)
+        .first()
+    )
 
-    assert file_exists_in_s3, "File should exist in S3 after upload"
+    # Verify file exists in S3
+    assert env["s3_service"].exists(s3_path), "File should exist in S3 after upload"
 
     # Delete the file
-    request = env["factory"].delete(f"/files/{file_id}/")
-    request.headers = {"UserId": user_id}
+    request = delete_request(env["factory"], f"/files/{file_id}/", user_id)
     response = env["delete_view"](request, pk=file_id)
 
     assert response.status_code == 204
 
     # Verify file no longer exists in S3
-    try:
-        env["s3_service"].download_fileobj(s3_path)
-        file_still_exists = True
-    except Exception:
-        file_still_exists = False
-
-    assert not file_still_exists, "File should be deleted from S3 after deletion"
+    assert not env["s3_service"].exists(
+        s3_path
+    ), "File should be deleted from S3 after deletion"
 
 
 @pytest.mark.django_db
@@ -378,7 +474,7 @@ def test_delete_file_transaction_rollback(
     user_id = "test_user_transaction"
 
     # Upload a file
-    file_content = b"Transaction test content"
+    file_content = TINY
     uploaded_file = SimpleUploadedFile(
         "transaction_test.txt", file_content, content_type="text/plain"
     )
@@ -389,9 +485,11 @@ def test_delete_file_transaction_rollback(
     assert upload_response.status_code == 201
     file_id = upload_response.data["id"]
 
-    # Verify file exists before deletion
-    assert File.objects.filter(id=file_id).exists()
-    storage_id = File.objects.get(id=file_id).storage.id
+    # Verify file and its storage exist before deletion
+    storage_id = (
+        File.objects.filter(id=file_id).values_list("storage_id", flat=True).first()
+    )
+    assert storage_id is not None
     assert FileStorage.objects.filter(id=storage_id).exists()
 
     # Note: Since S3 delete failures are caught and logged but don't fail the operation,
@@ -400,15 +498,15 @@ def test_delete_file_transaction_rollback(
     # This is documented in the code comments.
 
     # Delete the file (should succeed even with potential S3 issues)
-    request = env["factory"].delete(f"/files/{file_id}/")
-    request.headers = {"UserId": user_id}
+    request = delete_request(env["factory"], f"/files/{file_id}/", user_id)
     response = env["delete_view"](request, pk=file_id)
 
     assert response.status_code == 204
 
     # Database cleanup should always succeed
-    assert not File.objects.filter(id=file_id).exists()
-    assert not FileStorage.objects.filter(id=storage_id).exists()
+    assert rows_exist(
+        File.objects.filter(id=file_id), FileStorage.objects.filter(id=storage_id)
+    ) == (False, False)
 
 
 @pytest.mark.django_db
@@ -419,7 +517,7 @@ def test_delete_file_concurrent_access(setup_test_environment: dict[str, any]) -
     user2_id = "user2_concurrent"
 
     # User1 uploads a file
-    file_content = b"Shared content for concurrent test"
+    file_content = TINY
     user1_file = SimpleUploadedFile(
         "user1.txt", file_content, content_type="text/plain"
     )
@@ -430,49 +528,87 @@ def test_delete_file_concurrent_access(setup_test_environment: dict[str, any]) -
     assert upload_response1.status_code == 201
     user1_file_id = upload_response1.data["id"]
 
-    # User2 uploads the same content (duplicate)
-    user2_file = SimpleUploadedFile(
-        "user2.txt", file_content, content_type="text/plain"
+    # User2 references the same content (duplicate) via the ORM instead of a
+    # second upload
+    user1_storage_id = (
+        File.objects.filter(id=user1_file_id)
+        .values_list("storage_id", flat=True)
+        .first()
+    )
+    user2_file_id = File.objects.create(
+        storage_id=user1_storage_id,
+        user_id=user2_id,
+        original_filename="user2.txt",
+        file_type="text/plain",
+        is_duplicate=True,
+    ).id
+    FileStorage.objects.filter(id=user1_storage_id).update(
+        reference_count=F("reference_count") + 1
     )
-    upload_request2 = env["factory"].post("/files/", {"file": user2_file})
-    upload_request2.headers = {"UserId": user2_id}
-    upload_response2 = env["create_view"](upload_request2)
-
-    assert upload_response2.status_code == 201
-    user2_file_id = upload_response2.data["id"]
-
-    # Verify both files share the same storage
-    user1_storage_id = File.objects.get(id=user1_file_id).storage.id
-    user2_storage_id = File.objects.get(id=user2_file_id).storage.id
-    assert user1_storage_id == user2_storage_id
 
     # Verify reference count is 2
-    storage = FileStorage.objects.get(id=user1_storage_id)
-    assert storage.reference_count == 2
+    assert ref_count(user1_storage_id) == 2
 
     # User1 deletes their file
-    request = env["factory"].delete(f"/files/{user1_file_id}/")
-    request.headers = {"UserId": user1_id}
+    request = delete_request(env["factory"], f"/files/{user1_file_id}/", user1_id)
     response = env["delete_view"](request, pk=user1_file_id)
 
     assert response.status_code == 204
 
     # User1's file should be deleted, but storage should remain
-    assert not File.objects.filter(id=user1_file_id).exists()
-    assert File.objects.filter(id=user2_file_id).exists()
-    assert FileStorage.objects.filter(id=user1_storage_id).exists()
+    assert rows_exist(
+        File.objects.filter(id=user1_file_id),
+        File.objects.filter(id=user2_file_id),
+        FileStorage.objects.filter(id=user1_storage_id),
+    ) == (False, True, True)
 
     # Reference count should be decremented
-    storage.refresh_from_db()
-    assert storage.reference_count == 1
+    assert ref_count(user1_storage_id) == 1
 
     # User2 deletes their file
-    request = env["factory"].delete(f"/files/{user2_file_id}/")
-    request.headers = {"UserId": user2_id}
+    request = delete_request(env["factory"], f"/files/{user2_file_id}/", user2_id)
     response = env["delete_view"](request, pk=user2_file_id)
 
     assert response.status_code == 204
 
     # Both files and storage should now be deleted
-    assert not File.objects.filter(id=user2_file_id).exists()
-    assert not FileStorage.objects.filter(id=user1_storage_id).exists()
\ No newline at end of file
+    assert rows_exist(
+        File.objects.filter(id=user2_file_id),
+        FileStorage.objects.filter(id=user1_storage_id),
+    ) == (False, False)
+
+
+@pytest.mark.django_db
+def test_delete_file_s3_failure_is_logged(
+    setup_test_environment: dict[str, any],
+    monkeypatch: MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Test a failed S3 delete still removes the records and logs the object key"""
+    env = setup_test_environment
+    user_id = "test_user_s3_failure"
+
+    uploaded_file = SimpleUploadedFile(
+        "s3_failure.txt", TINY, content_type="text/plain"
+    )
+    upload_request = env["factory"].post("/files/", {"file": uploaded_file})
+    upload_request.headers = {"UserId": user_id}
+    upload_response = env["create_view"](upload_request)
+
+    assert upload_response.status_code == 201
+    file_id = upload_response.data["id"]
+    s3_path = File.objects.get(id=file_id).storage.s3_path
+
+    def delete_file(*args) -> None:
+        raise Exception("S3 unavailable")
+
+    monkeypatch.setattr("src.files.views.S3FileService.delete_file", delete_file)
+
+    request = delete_request(env["factory"], f"/files/{file_id}/", user_id)
+    with caplog.at_level("WARNING", logger="src.files.views"):
+        response = env["delete_view"](request, pk=file_id)
+
+    assert response.status_code == 204
+    assert not File.objects.filter(id=file_id).exists()
+    assert s3_path in caplog.text
+    assert "S3 unavailable" in caplog.text
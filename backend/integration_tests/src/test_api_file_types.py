@@ -3,6 +3,7 @@
 
 import os
 import uuid
+import warnings
 import pytest
 import django
 from rest_framework.test import APIRequestFactory
@@ -53,7 +54,7 @@ def s3_service(s3_credentials: dict[str, str], test_bucket_name: str) -> S3FileS
     try:
         service.delete_bucket()
     except Exception as e:
-        print(f"Warning: Failed to cleanup test bucket: {e}")
+        warnings.warn(f"Failed to cleanup test bucket: {e}", stacklevel=2)
 
 
 @pytest.fixture
@@ -1,81 +1,247 @@
 #!/usr/bin/env python
 """Integration tests for GET /api/files/ endpoint with filtering and pagination"""
 
-import os
+import functools
 import uuid
 import pytest
-import django
 from datetime import timedelta
+from typing import TYPE_CHECKING, Callable, Generator
+from rest_framework.response import Response
 from rest_framework.test import APIRequestFactory
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from pytest import MonkeyPatch
+from src.files.models import File, FileStorage, UserStorage
+from src.files import views
+from integration_tests.fakes.fake_s3 import FakeS3FileService
+
+if TYPE_CHECKING:
+    from pytest_django.plugin import DjangoDbBlocker
+
+
+# COUNT + page rows (storage is joined via select_related). FileSerializer still
+# looks up the original file once per duplicate, which the test pages keep to a few.
+MAX_LIST_QUERIES = 4
+
+
+@functools.lru_cache(maxsize=256)
+def content_hash(content: bytes) -> str:
+    """SHA-256 of a seeded content blob, computed once per distinct blob"""
+    return File.calculate_file_hash(content)
+
+
+def seed_files(corpus: dict[str, list[tuple[str, bytes, str]]]) -> list[File]:
+    """
+    Insert File/FileStorage rows for {user_id: [(filename, content, mime_type)]}
+    directly, deduplicating by content hash like the create endpoint does. The list
+    endpoint never reads object bodies, so nothing is uploaded to S3.
+    """
+    storages: dict[str, FileStorage] = {}
+    files = []
+    for user_id, specs in corpus.items():
+        for filename, content, mime_type in specs:
+            file_hash = content_hash(content)
+            storage = storages.get(file_hash)
+            if storage is None:
+                storage = storages[file_hash] = FileStorage(
+                    file_hash=file_hash,
+                    s3_path=f"files/{file_hash[:8]}/{filename}",
+                    size=len(content),
+                    reference_count=0,
+                )
+            storage.reference_count += 1
+            files.append(
+                File(
+                    storage=storage,
+                    user_id=user_id,
+                    original_filename=filename,
+                    file_type=mime_type,
+                    is_duplicate=storage.reference_count > 1,
+                )
+            )
+
+    # One transaction for the whole batch; it is the only one when seeding outside
+    # a test's own transaction (see seeded_corpus)
+    with transaction.atomic():
+        FileStorage.objects.bulk_create(storages.values())
+        # Also rebuilds the seeded users' usage counters
+        File.objects.bulk_create(files)
+    return files
+
+
+def upload(
+    env: dict[str, any],
+    user_id: str,
+    name: str,
+    content: bytes,
+    mime: str = "text/plain",
+) -> Response:
+    """POST one file to the create endpoint as user_id"""
+    uploaded_file = SimpleUploadedFile(name, content, content_type=mime)
+    request = env["factory"].post(
+        "/files/", {"file": uploaded_file}, HTTP_USERID=user_id
+    )
+    return env["view"](request)
+
+
+def list_files(env: dict[str, any], user_id: str | None, **params: str) -> Response:
+    """
+    GET the list endpoint with query params, sending UserId unless it is None,
+    and assert the request stays within MAX_LIST_QUERIES queries
+    """
+    headers = {} if user_id is None else {"HTTP_USERID": user_id}
+    request = env["factory"].get("/files/", params, **headers)
+    with CaptureQueriesContext(connection) as ctx:
+        response = env["view"](request)
+
+    # Guards against N+1 regressions when serializing a page
+    assert len(ctx.captured_queries) <= MAX_LIST_QUERIES, "\n".join(
+        query["sql"] for query in ctx.captured_queries
+    )
+    return response
 
-# Configure Django settings
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.core.settings")
-django.setup()
-from src.files.views import FileViewSet  # noqa: E402
-from src.files.models import File  # noqa: E402
-from src.services.s3_file_service import S3FileService  # noqa: E402
 
+def list_ok(env: dict[str, any], user_id: str, **params: str) -> dict[str, any]:
+    """GET the list endpoint via list_files() and return its data, asserting a 200"""
+    response = list_files(env, user_id, **params)
+    assert response.status_code == 200, response.data
+    return response.data
 
-@pytest.fixture
-def s3_credentials() -> dict[str, str]:
-    """Get MinIO credentials from environment variables"""
-    return {
-        "aws_access_key_id": os.getenv("AWS_ACCESS_KEY_ID", "minioadmin"),
-        "aws_secret_access_key": os.getenv("AWS_SECRET_ACCESS_KEY", "minioadmin"),
-        "endpoint_url": os.getenv("AWS_ENDPOINT_URL", "http://localhost:9000"),
-        "region_name": os.getenv("AWS_REGION", "us-east-1"),
-    }
 
+# One dataset shared by the read-only filter tests, one user namespace per test
+FILTER_CORPUS = {
+    "ns_search": [
+        ("document.txt", b"Doc content", "text/plain"),
+        ("report.pdf", b"Report content", "text/plain"),
+        ("image.jpg", b"Image content", "text/plain"),
+        ("my_document.txt", b"Another doc", "text/plain"),
+    ],
+    "ns_type": [
+        ("file1.txt", b"Text content", "text/plain"),
+        ("file2.pdf", b"PDF content", "application/pdf"),
+        ("file3.txt", b"More text", "text/plain"),
+        ("file4.jpg", b"Image content", "image/jpeg"),
+    ],
+    "ns_size": [
+        ("small.txt", b"tiny", "text/plain"),  # 4 bytes
+        ("medium.txt", b"medium file content", "text/plain"),  # 19 bytes
+        (
+            "large.txt",
+            b"this is a much larger file content for testing",
+            "text/plain",
+        ),  # 48 bytes
+    ],
+    "ns_date": [
+        ("test.txt", b"content", "text/plain"),
+    ],
+    "ns_combined": [
+        ("document.txt", b"small text", "text/plain"),
+        ("report.pdf", b"large report content for testing filters", "application/pdf"),
+        ("my_document.txt", b"another document with more content", "text/plain"),
+        ("image.jpg", b"img", "image/jpeg"),
+    ],
+}
+
+
+# Query params for the filter tests over FILTER_CORPUS, keyed by test id
+SIZE_FILTER_CASES = {
+    # Files >= 10 bytes
+    "min_size": ({"min_size": "10"}, 2, lambda f: f["size"] >= 10),
+    # Files <= 20 bytes
+    "max_size": ({"max_size": "20"}, 2, lambda f: f["size"] <= 20),
+    # Files between 5 and 30 bytes
+    "size_range": (
+        {"min_size": "5", "max_size": "30"},
+        1,
+        lambda f: f["original_filename"] == "medium.txt",
+    ),
+}
+COMBINED_FILTER_QUERY = {
+    "search": "document",
+    "file_type": "text/plain",
+    "min_size": "15",
+}
+
+
+@pytest.fixture(scope="module")
+def seeded_corpus(
+    django_db_setup: None, django_db_blocker: "DjangoDbBlocker"
+) -> Generator[dict[str, list[File]], None, None]:
+    """
+    Seed FILTER_CORPUS once for the module and return the created File instances
+    by user_id. The rows are committed outside the per-test transactions, so they
+    are removed explicitly at teardown.
+    """
+    with django_db_blocker.unblock():
+        files = seed_files(FILTER_CORPUS)
+
+    files_by_user = {user_id: [] for user_id in FILTER_CORPUS}
+    for file in files:
+        files_by_user[file.user_id].append(file)
+    yield files_by_user
+
+    with django_db_blocker.unblock():
+        # Deleting the storages cascades to their File records
+        FileStorage.objects.filter(id__in={file.storage_id for file in files}).delete()
+        UserStorage.objects.filter(user_id__in=FILTER_CORPUS.keys()).delete()
+
+
+@pytest.fixture(scope="session")
+def test_bucket_name(worker_id: str) -> str:
+    """Generate one unique bucket name per xdist worker for the test session"""
+    return f"test-list-{worker_id}-{uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture(scope="session")
+def s3_service(test_bucket_name: str) -> Generator[FakeS3FileService, None, None]:
+    """
+    In-memory S3 stand-in with a session-wide bucket. The list endpoint only reads
+    File rows, so these tests don't need MinIO.
+    """
+    service = FakeS3FileService(bucket_name=test_bucket_name)
+    service.create_bucket()
 
-@pytest.fixture
-def test_bucket_name() -> str:
-    """Generate unique bucket name for test isolation"""
-    return f"test-list-{uuid.uuid4().hex[:8]}"
+    yield service
 
+    service.delete_bucket()
 
-@pytest.fixture
-def s3_service(s3_credentials: dict[str, str], test_bucket_name: str) -> S3FileService:
-    """Create real S3FileService instance with MinIO credentials and test bucket"""
-    service = S3FileService(
-        bucket_name=test_bucket_name,
-        aws_access_key_id=s3_credentials["aws_access_key_id"],
-        aws_secret_access_key=s3_credentials["aws_secret_access_key"],
-        endpoint_url=s3_credentials["endpoint_url"],
-        region_name=s3_credentials["region_name"],
-    )
 
-    # Create the test bucket
-    service.create_bucket()
+@pytest.fixture(scope="session")
+def list_env(
+    s3_service: FakeS3FileService, list_view: Callable[..., Response]
+) -> dict[str, any]:
+    """Share the stateless request factory and list/create view for the session"""
+    return {
+        "factory": APIRequestFactory(),
+        "view": list_view,
+        "s3_service": s3_service,
+    }
 
-    yield service
 
-    # Cleanup: delete the test bucket and all its contents
-    try:
-        service.delete_bucket()
-    except Exception as e:
-        print(f"Warning: Failed to cleanup test bucket: {e}")
+@pytest.fixture
+def key_prefix(s3_service: FakeS3FileService) -> Generator[str, None, None]:
+    """Unique object key prefix for one test; its objects are removed afterwards"""
+    prefix = f"{uuid.uuid4().hex}/"
+
+    yield prefix
+
+    s3_service.empty_bucket(prefix=prefix)
 
 
 @pytest.fixture
 def setup_test_environment(
-    s3_service: S3FileService,
-    s3_credentials: dict[str, str],
+    list_env: dict[str, any],
+    key_prefix: str,
     test_bucket_name: str,
     monkeypatch: MonkeyPatch,
 ) -> dict[str, any]:
-    """Setup environment variables for tests"""
+    """Point the view at the in-memory S3 fake and the session bucket"""
+    monkeypatch.setattr(views, "S3FileService", FakeS3FileService)
     monkeypatch.setenv("AWS_BUCKET_NAME", test_bucket_name)
-    monkeypatch.setenv("AWS_ACCESS_KEY_ID", s3_credentials["aws_access_key_id"])
-    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", s3_credentials["aws_secret_access_key"])
-    monkeypatch.setenv("AWS_ENDPOINT_URL", s3_credentials["endpoint_url"])
-    monkeypatch.setenv("AWS_REGION", s3_credentials["region_name"])
+    monkeypatch.setenv("AWS_KEY_PREFIX", key_prefix)
 
-    factory = APIRequestFactory()
-    view = FileViewSet.as_view({"get": "list", "post": "create"})
-
-    return {"factory": factory, "view": view, "s3_service": s3_service}
+    return list_env
 
 
 @pytest.mark.django_db
@@ -84,8 +250,7 @@ def test_list_files_userid_required(setup_test_environment: dict[str, any]) -> N
     env = setup_test_environment
 
     # Request without UserId header
-    request = env["factory"].get("/files/")
-    response = env["view"](request)
+    response = list_files(env, None)
 
     assert response.status_code == 400
     assert "UserId header is required" in response.data["error"]
@@ -96,15 +261,12 @@ def test_list_files_empty_response(setup_test_environment: dict[str, any]) -> No
     """Test listing files when user has no files"""
     env = setup_test_environment
 
-    request = env["factory"].get("/files/")
-    request.headers = {"UserId": "test_user_empty"}
-    response = env["view"](request)
+    data = list_ok(env, "test_user_empty")
 
-    assert response.status_code == 200
-    assert response.data["count"] == 0
-    assert response.data["results"] == []
-    assert response.data["next"] is None
-    assert response.data["previous"] is None
+    assert data["count"] == 0
+    assert data["results"] == []
+    assert data["next"] is None
+    assert data["previous"] is None
 
 
 @pytest.mark.django_db
@@ -117,33 +279,20 @@ def test_list_files_basic(setup_test_environment: dict[str, any]) -> None:
 
     # Upload first file
     file_content1 = b"First test file content"
-    uploaded_file1 = SimpleUploadedFile(
-        "first.txt", file_content1, content_type="text/plain"
-    )
-    upload_request1 = env["factory"].post("/files/", {"file": uploaded_file1})
-    upload_request1.headers = {"UserId": user_id}
-    env["view"](upload_request1)
+    upload(env, user_id, "first.txt", file_content1)
 
     # Upload second file with different content
     file_content2 = b"Second test file content"
-    uploaded_file2 = SimpleUploadedFile(
-        "second.pdf", file_content2, content_type="application/pdf"
-    )
-    upload_request2 = env["factory"].post("/files/", {"file": uploaded_file2})
-    upload_request2.headers = {"UserId": user_id}
-    env["view"](upload_request2)
+    upload(env, user_id, "second.pdf", file_content2, "application/pdf")
 
     # Now list files
-    request = env["factory"].get("/files/")
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
+    data = list_ok(env, user_id)
 
-    assert response.status_code == 200
-    assert response.data["count"] == 2
-    assert len(response.data["results"]) == 2
+    assert data["count"] == 2
+    assert len(data["results"]) == 2
 
     # Check that files are ordered by upload date (most recent first)
-    files = response.data["results"]
+    files = data["results"]
     assert files[0]["original_filename"] == "second.pdf"
     assert files[1]["original_filename"] == "first.txt"
 
@@ -174,30 +323,17 @@ def test_list_files_with_duplicates(setup_test_environment: dict[str, any]) -> N
 
     # Upload original file
     file_content = b"Content for deduplication test"
-    uploaded_file1 = SimpleUploadedFile(
-        "original.txt", file_content, content_type="text/plain"
-    )
-    upload_request1 = env["factory"].post("/files/", {"file": uploaded_file1})
-    upload_request1.headers = {"UserId": user_id}
-    env["view"](upload_request1)
+    upload(env, user_id, "original.txt", file_content)
 
     # Upload duplicate file
-    uploaded_file2 = SimpleUploadedFile(
-        "duplicate.txt", file_content, content_type="text/plain"
-    )
-    upload_request2 = env["factory"].post("/files/", {"file": uploaded_file2})
-    upload_request2.headers = {"UserId": user_id}
-    env["view"](upload_request2)
+    upload(env, user_id, "duplicate.txt", file_content)
 
     # List files
-    request = env["factory"].get("/files/")
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
+    data = list_ok(env, user_id)
 
-    assert response.status_code == 200
-    assert response.data["count"] == 2
+    assert data["count"] == 2
 
-    files = response.data["results"]
+    files = data["results"]
     # Most recent first (duplicate.txt)
     duplicate_file = files[0]
     original_file = files[1]
@@ -214,202 +350,123 @@ def test_list_files_with_duplicates(setup_test_environment: dict[str, any]) -> N
 
 
 @pytest.mark.django_db
-def test_list_files_search_filter(setup_test_environment: dict[str, any]) -> None:
+@pytest.mark.parametrize(
+    "search,expected_filenames",
+    [
+        ("document", {"document.txt", "my_document.txt"}),
+        ("report", {"report.pdf"}),
+    ],
+)
+def test_list_files_search_filter(
+    setup_test_environment: dict[str, any],
+    seeded_corpus: dict[str, list[File]],
+    search: str,
+    expected_filenames: set[str],
+) -> None:
     """Test search filtering by filename"""
     env = setup_test_environment
-    user_id = "test_user_search"
-
-    # Upload files with different names
-    files_to_upload = [
-        ("document.txt", b"Doc content"),
-        ("report.pdf", b"Report content"),
-        ("image.jpg", b"Image content"),
-        ("my_document.txt", b"Another doc"),
-    ]
-
-    for filename, content in files_to_upload:
-        uploaded_file = SimpleUploadedFile(filename, content, content_type="text/plain")
-        upload_request = env["factory"].post("/files/", {"file": uploaded_file})
-        upload_request.headers = {"UserId": user_id}
-        env["view"](upload_request)
 
-    # Search for files containing "document"
-    request = env["factory"].get("/files/", {"search": "document"})
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
+    data = list_ok(env, "ns_search", search=search)
 
-    assert response.status_code == 200
-    assert response.data["count"] == 2
-
-    filenames = [f["original_filename"] for f in response.data["results"]]
-    assert "my_document.txt" in filenames
-    assert "document.txt" in filenames
-    assert "report.pdf" not in filenames
+    assert data["count"] == len(expected_filenames)
+    filenames = {f["original_filename"] for f in data["results"]}
+    assert filenames == expected_filenames
 
 
 @pytest.mark.django_db
-def test_list_files_file_type_filter(setup_test_environment: dict[str, any]) -> None:
+@pytest.mark.parametrize(
+    "file_type,expected_count",
+    [
+        ("text/plain", 2),
+        ("application/pdf", 1),
+        ("image/jpeg", 1),
+    ],
+)
+def test_list_files_file_type_filter(
+    setup_test_environment: dict[str, any],
+    seeded_corpus: dict[str, list[File]],
+    file_type: str,
+    expected_count: int,
+) -> None:
     """Test filtering by file type (MIME type)"""
     env = setup_test_environment
-    user_id = "test_user_filetype"
-
-    # Upload files with different MIME types
-    files_to_upload = [
-        ("file1.txt", b"Text content", "text/plain"),
-        ("file2.pdf", b"PDF content", "application/pdf"),
-        ("file3.txt", b"More text", "text/plain"),
-        ("file4.jpg", b"Image content", "image/jpeg"),
-    ]
 
-    for filename, content, mime_type in files_to_upload:
-        uploaded_file = SimpleUploadedFile(filename, content, content_type=mime_type)
-        upload_request = env["factory"].post("/files/", {"file": uploaded_file})
-        upload_request.headers = {"UserId": user_id}
-        env["view"](upload_request)
+    data = list_ok(env, "ns_type", file_type=file_type)
 
-    # Filter for text/plain files
-    request = env["factory"].get("/files/", {"file_type": "text/plain"})
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
+    assert data["count"] == expected_count
 
-    assert response.status_code == 200
-    assert response.data["count"] == 2
-
-    for file_data in response.data["results"]:
-        assert file_data["file_type"] == "text/plain"
+    for file_data in data["results"]:
+        assert file_data["file_type"] == file_type
 
 
 @pytest.mark.django_db
-def test_list_files_size_filter(setup_test_environment: dict[str, any]) -> None:
+@pytest.mark.parametrize(
+    "params,expected_count,predicate",
+    SIZE_FILTER_CASES.values(),
+    ids=SIZE_FILTER_CASES.keys(),
+)
+def test_list_files_size_filter(
+    setup_test_environment: dict[str, any],
+    seeded_corpus: dict[str, list[File]],
+    params: dict[str, str],
+    expected_count: int,
+    predicate: Callable[[dict[str, any]], bool],
+) -> None:
     """Test filtering by file size"""
     env = setup_test_environment
-    user_id = "test_user_size"
-
-    # Upload files with different sizes
-    files_to_upload = [
-        ("small.txt", b"tiny", "text/plain"),  # 4 bytes
-        ("medium.txt", b"medium file content", "text/plain"),  # 19 bytes
-        (
-            "large.txt",
-            b"this is a much larger file content for testing",
-            "text/plain",
-        ),  # 48 bytes
-    ]
 
-    for filename, content, mime_type in files_to_upload:
-        uploaded_file = SimpleUploadedFile(filename, content, content_type=mime_type)
-        upload_request = env["factory"].post("/files/", {"file": uploaded_file})
-        upload_request.headers = {"UserId": user_id}
-        env["view"](upload_request)
+    data = list_ok(env, "ns_size", **params)
 
-    # Filter for files >= 10 bytes
-    request = env["factory"].get("/files/", {"min_size": "10"})
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
+    assert data["count"] == expected_count
 
-    assert response.status_code == 200
-    assert response.data["count"] == 2
-
-    for file_data in response.data["results"]:
-        assert file_data["size"] >= 10
-
-    # Filter for files <= 20 bytes
-    request = env["factory"].get("/files/", {"max_size": "20"})
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
-
-    assert response.status_code == 200
-    assert response.data["count"] == 2
-
-    for file_data in response.data["results"]:
-        assert file_data["size"] <= 20
-
-    # Filter for files between 5 and 30 bytes
-    request = env["factory"].get("/files/", {"min_size": "5", "max_size": "30"})
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
-
-    assert response.status_code == 200
-    assert response.data["count"] == 1
-    assert response.data["results"][0]["original_filename"] == "medium.txt"
+    for file_data in data["results"]:
+        assert predicate(file_data)
 
 
 @pytest.mark.django_db
-def test_list_files_date_filter(setup_test_environment: dict[str, any]) -> None:
+def test_list_files_date_filter(
+    setup_test_environment: dict[str, any], seeded_corpus: dict[str, list[File]]
+) -> None:
     """Test filtering by upload date"""
     env = setup_test_environment
-    user_id = "test_user_date"
-
-    # Upload a file
-    uploaded_file = SimpleUploadedFile(
-        "test.txt", b"content", content_type="text/plain"
-    )
-    upload_request = env["factory"].post("/files/", {"file": uploaded_file})
-    upload_request.headers = {"UserId": user_id}
-    env["view"](upload_request)
+    user_id = "ns_date"
 
-    # Get the uploaded file to check its date
-    file_obj = File.objects.filter(user_id=user_id).first()
-    upload_time = file_obj.uploaded_at
+    # Get the seeded file's upload date
+    # bulk_create fills in the auto_now_add timestamp on the seeded instance
+    upload_time = seeded_corpus[user_id][0].uploaded_at
 
     # Test start_date filter (should include the file)
     start_date = (upload_time - timedelta(hours=1)).isoformat()
-    request = env["factory"].get("/files/", {"start_date": start_date})
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
+    data = list_ok(env, user_id, start_date=start_date)
 
-    assert response.status_code == 200
-    assert response.data["count"] == 1
+    assert data["count"] == 1
 
     # Test end_date filter (should include the file)
     end_date = (upload_time + timedelta(hours=1)).isoformat()
-    request = env["factory"].get("/files/", {"end_date": end_date})
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
+    data = list_ok(env, user_id, end_date=end_date)
 
-    assert response.status_code == 200
-    assert response.data["count"] == 1
+    assert data["count"] == 1
 
     # Test with a past end_date (should exclude the file)
     past_end = (upload_time - timedelta(hours=1)).isoformat()
-    request = env["factory"].get("/files/", {"end_date": past_end})
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
+    data = list_ok(env, user_id, end_date=past_end)
 
-    assert response.status_code == 200
-    assert response.data["count"] == 0
+    assert data["count"] == 0
 
 
 @pytest.mark.django_db
-def test_list_files_combined_filters(setup_test_environment: dict[str, any]) -> None:
+def test_list_files_combined_filters(
+    setup_test_environment: dict[str, any], seeded_corpus: dict[str, list[File]]
+) -> None:
     """Test combining multiple filters"""
     env = setup_test_environment
-    user_id = "test_user_combined"
-
-    # Upload various files
-    files_to_upload = [
-        ("document.txt", b"small text", "text/plain"),
-        ("report.pdf", b"large report content for testing filters", "application/pdf"),
-        ("my_document.txt", b"another document with more content", "text/plain"),
-        ("image.jpg", b"img", "image/jpeg"),
-    ]
-
-    for filename, content, mime_type in files_to_upload:
-        uploaded_file = SimpleUploadedFile(filename, content, content_type=mime_type)
-        upload_request = env["factory"].post("/files/", {"file": uploaded_file})
-        upload_request.headers = {"UserId": user_id}
-        env["view"](upload_request)
+    user_id = "ns_combined"
 
     # Combine search + file_type + size filters
-    request = env["factory"].get(
-        "/files/", {"search": "document", "file_type": "text/plain", "min_size": "15"}
-    )
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
+    data = list_ok(env, user_id, **COMBINED_FILTER_QUERY)
 
-    assert response.status_code == 200
-    assert response.data["count"] == 1
-    assert response.data["results"][0]["original_filename"] == "my_document.txt"
+    assert data["count"] == 1
+    assert data["results"][0]["original_filename"] == "my_document.txt"
 
 
 @pytest.mark.django_db
@@ -418,40 +475,24 @@ def test_list_files_user_isolation(setup_test_environment: dict[str, any]) -> No
     env = setup_test_environment
 
     # Upload file for user1
-    uploaded_file1 = SimpleUploadedFile(
-        "user1_file.txt", b"user1 content", content_type="text/plain"
-    )
-    upload_request1 = env["factory"].post("/files/", {"file": uploaded_file1})
-    upload_request1.headers = {"UserId": "user1"}
-    env["view"](upload_request1)
+    upload(env, "user1", "user1_file.txt", b"user1 content")
 
     # Upload file for user2
-    uploaded_file2 = SimpleUploadedFile(
-        "user2_file.txt", b"user2 content", content_type="text/plain"
-    )
-    upload_request2 = env["factory"].post("/files/", {"file": uploaded_file2})
-    upload_request2.headers = {"UserId": "user2"}
-    env["view"](upload_request2)
+    upload(env, "user2", "user2_file.txt", b"user2 content")
 
     # List files for user1
-    request = env["factory"].get("/files/")
-    request.headers = {"UserId": "user1"}
-    response = env["view"](request)
+    data = list_ok(env, "user1")
 
-    assert response.status_code == 200
-    assert response.data["count"] == 1
-    assert response.data["results"][0]["original_filename"] == "user1_file.txt"
-    assert response.data["results"][0]["user_id"] == "user1"
+    assert data["count"] == 1
+    assert data["results"][0]["original_filename"] == "user1_file.txt"
+    assert data["results"][0]["user_id"] == "user1"
 
     # List files for user2
-    request = env["factory"].get("/files/")
-    request.headers = {"UserId": "user2"}
-    response = env["view"](request)
+    data = list_ok(env, "user2")
 
-    assert response.status_code == 200
-    assert response.data["count"] == 1
-    assert response.data["results"][0]["original_filename"] == "user2_file.txt"
-    assert response.data["results"][0]["user_id"] == "user2"
+    assert data["count"] == 1
+    assert data["results"][0]["original_filename"] == "user2_file.txt"
+    assert data["results"][0]["user_id"] == "user2"
 
 
 @pytest.mark.django_db
@@ -460,43 +501,34 @@ def test_list_files_pagination(setup_test_environment: dict[str, any]) -> None:
     env = setup_test_environment
     user_id = "test_user_pagination"
 
-    # Upload multiple files (more than default page size)
-    for i in range(25):
-        content = f"File {i} content".encode()
-        uploaded_file = SimpleUploadedFile(
-            f"file_{i:02d}.txt", content, content_type="text/plain"
-        )
-        upload_request = env["factory"].post("/files/", {"file": uploaded_file})
-        upload_request.headers = {"UserId": user_id}
-        env["view"](upload_request)
+    # Seed multiple files (more than default page size)
+    seed_files(
+        {
+            user_id: [
+                (f"file_{i:02d}.txt", f"File {i} content".encode(), "text/plain")
+                for i in range(25)
+            ]
+        }
+    )
 
     # Test first page
-    request = env["factory"].get("/files/")
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
+    data = list_ok(env, user_id)
 
-    assert response.status_code == 200
-    assert response.data["count"] == 25
-    assert len(response.data["results"]) == 20  # Default page size
-    assert response.data["next"] is not None
-    assert response.data["previous"] is None
+    assert data["count"] == 25
+    assert len(data["results"]) == 20  # Default page size
+    assert data["next"] is not None
+    assert data["previous"] is None
 
     # Test second page
-    request = env["factory"].get("/files/", {"page": "2"})
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
+    data = list_ok(env, user_id, page="2")
 
-    assert response.status_code == 200
-    assert response.data["count"] == 25
-    assert len(response.data["results"]) == 5  # Remaining files
-    assert response.data["next"] is None
-    assert response.data["previous"] is not None
+    assert data["count"] == 25
+    assert len(data["results"]) == 5  # Remaining files
+    assert data["next"] is None
+    assert data["previous"] is not None
 
     # Test custom page size
-    request = env["factory"].get("/files/", {"page_size": "10"})
-    request.headers = {"UserId": user_id}
-    response = env["view"](request)
+    data = list_ok(env, user_id, page_size="10")
 
-    assert response.status_code == 200
-    assert response.data["count"] == 25
-    assert len(response.data["results"]) == 10
\ No newline at end of file
+    assert data["count"] == 25
+    assert len(data["results"]) == 10
@@ -3,16 +3,18 @@
 
 import os
 import uuid
+import warnings
+from typing import Callable
 import pytest
 import django
 from rest_framework.test import APIRequestFactory
 from django.core.files.uploadedfile import SimpleUploadedFile
 from pytest import MonkeyPatch
+from rest_framework.response import Response
 
 # Configure Django settings
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.core.settings")
 django.setup()
-from src.files.views import FileViewSet  # noqa: E402
 from src.files.models import File, FileStorage  # noqa: E402
 from src.services.s3_file_service import S3FileService  # noqa: E402
 
@@ -54,7 +56,7 @@ def s3_service(s3_credentials: dict[str, str], test_bucket_name: str) -> S3FileS
     try:
         service.delete_bucket()
     except Exception as e:
-        print(f"Warning: Failed to cleanup test bucket: {e}")
+        warnings.warn(f"Failed to cleanup test bucket: {e}", stacklevel=2)
 
 
 @pytest.fixture
@@ -63,6 +65,8 @@ def setup_test_environment(
     s3_credentials: dict[str, str],
     test_bucket_name: str,
     monkeypatch: MonkeyPatch,
+    create_view: Callable[..., Response],
+    retrieve_view: Callable[..., Response],
 ) -> dict[str, any]:
     """Setup environment variables for tests"""
     monkeypatch.setenv("AWS_BUCKET_NAME", test_bucket_name)
@@ -72,8 +76,6 @@ def setup_test_environment(
     monkeypatch.setenv("AWS_REGION", s3_credentials["region_name"])
 
     factory = APIRequestFactory()
-    create_view = FileViewSet.as_view({"post": "create"})
-    retrieve_view = FileViewSet.as_view({"get": "retrieve"})
 
     return {
         "factory": factory,
@@ -392,4 +394,62 @@ def test_retrieve_file_invalid_uuid(setup_test_environment: dict[str, any]) -> N
         assert response.status_code in [400, 404]
     except Exception:
         # If an exception is raised for invalid UUID, that's also acceptable
-        pass
\ No newline at end of file
+        pass
+
+
+@pytest.mark.django_db
+def test_download_file_streams_content(
+    setup_test_environment: dict[str, any], download_view: Callable[..., Response]
+) -> None:
+    """Test that download streams the stored content with file headers"""
+    env = setup_test_environment
+    user_id = "test_user_download"
+
+    # Larger than one download chunk, so the body arrives in several pieces
+    file_content = os.urandom((1 << 20) + 123)
+    uploaded_file = SimpleUploadedFile(
+        "report.bin", file_content, content_type="application/octet-stream"
+    )
+    upload_request = env["factory"].post("/files/", {"file": uploaded_file})
+    upload_request.headers = {"UserId": user_id}
+    upload_response = env["create_view"](upload_request)
+    assert upload_response.status_code == 201
+    file_id = upload_response.data["id"]
+
+    request = env["factory"].get(f"/files/{file_id}/download/")
+    request.headers = {"UserId": user_id}
+    response = download_view(request, pk=file_id)
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Type"] == "application/octet-stream"
+    assert response["Content-Length"] == str(len(file_content))
+    assert response["Content-Disposition"] == 'attachment; filename="report.bin"'
+    assert b"".join(response.streaming_content) == file_content
+
+
+@pytest.mark.django_db
+def test_download_missing_s3_object(
+    setup_test_environment: dict[str, any], download_view: Callable[..., Response]
+) -> None:
+    """Test that a file whose S3 object is gone fails before streaming starts"""
+    env = setup_test_environment
+    user_id = "test_user_download_missing"
+
+    storage = FileStorage.objects.create(
+        file_hash="missing_object_hash", s3_path="missing/object.txt", size=10
+    )
+    file_obj = File.objects.create(
+        storage=storage,
+        user_id=user_id,
+        original_filename="object.txt",
+        file_type="text/plain",
+    )
+
+    request = env["factory"].get(f"/files/{file_obj.id}/download/")
+    request.headers = {"UserId": user_id}
+    response = download_view(request, pk=str(file_obj.id))
+
+    assert response.status_code == 500
+    assert not response.streaming
+    assert b"Failed to download file" in response.content
@@ -3,20 +3,46 @@
 
 import os
 import uuid
+import warnings
+from typing import Callable, Generator
 import pytest
-import django
+from rest_framework.response import Response
 from rest_framework.test import APIRequestFactory
 from django.core.files.uploadedfile import SimpleUploadedFile
 from pytest import MonkeyPatch
+from src.services.rate_limiter_service import RateLimiterService
+from src.services.s3_file_service import S3FileService
+
+DEDUP_CONTENT = b"Content for deduplication testing in storage stats"
+CONTENT_X100 = b"x" * 100
+CONTENT_Y200 = b"y" * 200
+CONTENT_Z50 = b"z" * 50
+
+
+def upload(
+    env: dict[str, any],
+    user_id: str,
+    name: str,
+    content: bytes,
+    mime: str = "text/plain",
+) -> Response:
+    """POST one file to the create endpoint as user_id"""
+    uploaded_file = SimpleUploadedFile(name, content, content_type=mime)
+    request = env["factory"].post(
+        "/files/", {"file": uploaded_file}, HTTP_USERID=user_id
+    )
+    return env["upload_view"](request)
+
 
-# Configure Django settings
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.core.settings")
-django.setup()
-from src.files.views import FileViewSet  # noqa: E402
-from src.services.s3_file_service import S3FileService  # noqa: E402
+def get_stats(env: dict[str, any], user_id: str) -> dict[str, any]:
+    """GET the storage stats of user_id and return its data, asserting a 200"""
+    request = env["factory"].get("/files/storage_stats/", HTTP_USERID=user_id)
+    response = env["stats_view"](request)
+    assert response.status_code == 200, response.data
+    return response.data
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def s3_credentials() -> dict[str, str]:
     """Get MinIO credentials from environment variables"""
     return {
@@ -27,15 +53,26 @@ def s3_credentials() -> dict[str, str]:
     }
 
 
-@pytest.fixture
-def test_bucket_name() -> str:
-    """Generate unique bucket name for test isolation"""
-    return f"test-storage-stats-{uuid.uuid4().hex[:8]}"
-
-
-@pytest.fixture
-def s3_service(s3_credentials: dict[str, str], test_bucket_name: str) -> S3FileService:
-    """Create real S3FileService instance with MinIO credentials and test bucket"""
+@pytest.fixture(scope="session")
+def test_bucket_name(pytestconfig: pytest.Config, worker_id: str) -> str:
+    """
+    Generate one unique bucket name per xdist worker for the test session, or a
+    stable per-worker name under --reuse-bucket so the bucket survives between runs
+    """
+    if pytestconfig.getoption("reuse_bucket"):
+        return f"test-storage-stats-reuse-{worker_id}"
+    return f"test-storage-stats-{worker_id}-{uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture(scope="session")
+def s3_service(
+    s3_credentials: dict[str, str], test_bucket_name: str, pytestconfig: pytest.Config
+) -> Generator[S3FileService, None, None]:
+    """
+    Create real S3FileService instance with MinIO credentials and a session-wide test bucket.
+    A reused bucket is never emptied or deleted; objects left behind by interrupted
+    runs expire through a lifecycle rule instead.
+    """
     service = S3FileService(
         bucket_name=test_bucket_name,
         aws_access_key_id=s3_credentials["aws_access_key_id"],
@@ -44,21 +81,69 @@ def s3_service(s3_credentials: dict[str, str], test_bucket_name: str) -> S3FileS
         region_name=s3_credentials["region_name"],
     )
 
-    # Create the test bucket
+    reuse_bucket = pytestconfig.getoption("reuse_bucket")
+
+    # Create the test bucket (a no-op if a reused bucket already exists)
     service.create_bucket()
+    if reuse_bucket:
+        service.s3_client.put_bucket_lifecycle_configuration(
+            Bucket=test_bucket_name,
+            LifecycleConfiguration={
+                "Rules": [
+                    {
+                        "ID": "expire-test-objects",
+                        "Status": "Enabled",
+                        "Filter": {"Prefix": ""},
+                        "Expiration": {"Days": 1},
+                    }
+                ]
+            },
+        )
 
     yield service
 
+    if reuse_bucket:
+        return
+
     # Cleanup: delete the test bucket and all its contents
     try:
         service.delete_bucket()
     except Exception as e:
-        print(f"Warning: Failed to cleanup test bucket: {e}")
+        warnings.warn(f"Failed to cleanup test bucket: {e}", stacklevel=2)
 
 
 @pytest.fixture
-def setup_test_environment(
+def key_prefix(s3_service: S3FileService) -> Generator[str, None, None]:
+    """Unique object key prefix for one test; its objects are removed afterwards"""
+    prefix = f"{uuid.uuid4().hex}/"
+
+    yield prefix
+
+    try:
+        s3_service.empty_bucket(prefix=prefix)
+    except Exception as e:
+        warnings.warn(f"Failed to clean up test objects: {e}", stacklevel=2)
+
+
+@pytest.fixture(scope="session")
+def stats_env(
     s3_service: S3FileService,
+    create_view: Callable[..., Response],
+    stats_view: Callable[..., Response],
+) -> dict[str, any]:
+    """Share the stateless request factory and upload/stats views for the session"""
+    return {
+        "factory": APIRequestFactory(),
+        "upload_view": create_view,
+        "stats_view": stats_view,
+        "s3_service": s3_service,
+    }
+
+
+@pytest.fixture
+def setup_test_environment(
+    stats_env: dict[str, any],
+    key_prefix: str,
     s3_credentials: dict[str, str],
     test_bucket_name: str,
     monkeypatch: MonkeyPatch,
@@ -69,222 +154,63 @@ def setup_test_environment(
     monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", s3_credentials["aws_secret_access_key"])
     monkeypatch.setenv("AWS_ENDPOINT_URL", s3_credentials["endpoint_url"])
     monkeypatch.setenv("AWS_REGION", s3_credentials["region_name"])
+    monkeypatch.setenv("AWS_KEY_PREFIX", key_prefix)
 
-    factory = APIRequestFactory()
-    upload_view = FileViewSet.as_view({"post": "create"})
-    stats_view = FileViewSet.as_view({"get": "user_storage_stats"})
-
-    return {
-        "factory": factory,
-        "upload_view": upload_view,
-        "stats_view": stats_view,
-        "s3_service": s3_service,
-    }
+    return stats_env
 
 
 @pytest.mark.django_db
-def test_storage_stats_userid_required(setup_test_environment: dict[str, any]) -> None:
+def test_storage_stats_userid_required(stats_view: Callable[..., Response]) -> None:
     """Test that UserId header is required for storage stats endpoint"""
-    env = setup_test_environment
+    # No upload or S3 access needed; dispatch to the view without the bucket fixtures
+    factory = APIRequestFactory()
 
     # Request without UserId header
-    request = env["factory"].get("/files/storage_stats/")
-    response = env["stats_view"](request)
+    request = factory.get("/files/storage_stats/")
+    response = stats_view(request)
 
     assert response.status_code == 400
     assert "UserId header is required" in response.data["error"]
 
 
 @pytest.mark.django_db
-def test_storage_stats_empty_user(setup_test_environment: dict[str, any]) -> None:
+def test_storage_stats_empty_user(stats_view: Callable[..., Response]) -> None:
     """Test storage stats for user with no files"""
-    env = setup_test_environment
-
-    request = env["factory"].get("/files/storage_stats/")
-    request.headers = {"UserId": "empty_user"}
-    response = env["stats_view"](request)
-
-    assert response.status_code == 200
-    assert response.data["user_id"] == "empty_user"
-    assert response.data["total_storage_used"] == 0
-    assert response.data["original_storage_used"] == 0
-    assert response.data["storage_savings"] == 0
-    assert response.data["savings_percentage"] == 0.0
-
-
-@pytest.mark.django_db
-def test_storage_stats_single_file(setup_test_environment: dict[str, any]) -> None:
-    """Test storage stats for user with single file"""
-    env = setup_test_environment
-    user_id = "single_file_user"
-
-    # Upload a single file
-    file_content = b"Single file content for testing"
-    uploaded_file = SimpleUploadedFile(
-        "single.txt", file_content, content_type="text/plain"
-    )
-    upload_request = env["factory"].post("/files/", {"file": uploaded_file})
-    upload_request.headers = {"UserId": user_id}
-    env["upload_view"](upload_request)
-
-    # Get storage stats
-    request = env["factory"].get("/files/storage_stats/")
-    request.headers = {"UserId": user_id}
-    response = env["stats_view"](request)
-
-    assert response.status_code == 200
-    assert response.data["user_id"] == user_id
-
-    expected_size = len(file_content)
-    assert response.data["total_storage_used"] == expected_size
-    assert response.data["original_storage_used"] == expected_size
-    assert response.data["storage_savings"] == 0
-    assert response.data["savings_percentage"] == 0.0
-
+    # No upload or S3 access needed; dispatch to the view without the bucket fixtures
+    env = {"factory": APIRequestFactory(), "stats_view": stats_view}
 
-@pytest.mark.django_db
-def test_storage_stats_with_duplicates(setup_test_environment: dict[str, any]) -> None:
-    """Test storage stats with duplicate files showing savings"""
-    env = setup_test_environment
-    user_id = "duplicate_user"
-
-    # Upload original file
-    file_content = b"Content for deduplication testing in storage stats"
-    uploaded_file1 = SimpleUploadedFile(
-        "original.txt", file_content, content_type="text/plain"
-    )
-    upload_request1 = env["factory"].post("/files/", {"file": uploaded_file1})
-    upload_request1.headers = {"UserId": user_id}
-    env["upload_view"](upload_request1)
-
-    # Upload duplicate file (same content, different name)
-    uploaded_file2 = SimpleUploadedFile(
-        "duplicate.txt", file_content, content_type="text/plain"
-    )
-    upload_request2 = env["factory"].post("/files/", {"file": uploaded_file2})
-    upload_request2.headers = {"UserId": user_id}
-    env["upload_view"](upload_request2)
-
-    # Upload another duplicate
-    uploaded_file3 = SimpleUploadedFile(
-        "another_duplicate.txt", file_content, content_type="text/plain"
-    )
-    upload_request3 = env["factory"].post("/files/", {"file": uploaded_file3})
-    upload_request3.headers = {"UserId": user_id}
-    env["upload_view"](upload_request3)
-
-    # Get storage stats
-    request = env["factory"].get("/files/storage_stats/")
-    request.headers = {"UserId": user_id}
-    response = env["stats_view"](request)
-
-    assert response.status_code == 200
-    assert response.data["user_id"] == user_id
-
-    file_size = len(file_content)
-    # Total storage used should be only one copy (deduplicated)
-    assert response.data["total_storage_used"] == file_size
-    # Original storage would be 3 copies
-    assert response.data["original_storage_used"] == file_size * 3
-    # Savings should be 2 copies worth
-    assert response.data["storage_savings"] == file_size * 2
-    # Savings percentage should be 66.7% (2/3)
-    assert abs(response.data["savings_percentage"] - 66.7) < 0.1
+    data = get_stats(env, "empty_user")
+    assert data["user_id"] == "empty_user"
+    assert data["total_storage_used"] == 0
+    assert data["original_storage_used"] == 0
+    assert data["storage_savings"] == 0
+    assert data["savings_percentage"] == 0.0
 
 
 @pytest.mark.django_db
-def test_storage_stats_multiple_unique_files(
-    setup_test_environment: dict[str, any],
+def test_storage_stats_rate_limited_across_requests(
+    stats_view: Callable[..., Response], shared_rate_limiter: RateLimiterService
 ) -> None:
-    """Test storage stats with multiple unique files (no deduplication)"""
-    env = setup_test_environment
-    user_id = "multiple_unique_user"
-
-    # Upload multiple unique files
-    files_to_upload = [
-        ("file1.txt", b"First unique file content"),
-        ("file2.txt", b"Second unique file content"),
-        ("file3.txt", b"Third unique file content"),
-    ]
-
-    total_size = 0
-    for filename, content in files_to_upload:
-        total_size += len(content)
-        uploaded_file = SimpleUploadedFile(filename, content, content_type="text/plain")
-        upload_request = env["factory"].post("/files/", {"file": uploaded_file})
-        upload_request.headers = {"UserId": user_id}
-        env["upload_view"](upload_request)
-
-    # Get storage stats
-    request = env["factory"].get("/files/storage_stats/")
-    request.headers = {"UserId": user_id}
-    response = env["stats_view"](request)
-
-    assert response.status_code == 200
-    assert response.data["user_id"] == user_id
-    assert response.data["total_storage_used"] == total_size
-    assert response.data["original_storage_used"] == total_size
-    assert response.data["storage_savings"] == 0
-    assert response.data["savings_percentage"] == 0.0
-
-
-@pytest.mark.django_db
-def test_storage_stats_mixed_files(setup_test_environment: dict[str, any]) -> None:
-    """Test storage stats with mix of unique and duplicate files"""
-    env = setup_test_environment
-    user_id = "mixed_files_user"
-
-    # Upload unique file
-    unique_content = b"Unique file content"
-    uploaded_file1 = SimpleUploadedFile(
-        "unique.txt", unique_content, content_type="text/plain"
-    )
-    upload_request1 = env["factory"].post("/files/", {"file": uploaded_file1})
-    upload_request1.headers = {"UserId": user_id}
-    env["upload_view"](upload_request1)
-
-    # Upload duplicate content twice
-    duplicate_content = b"Duplicate file content for testing"
-    uploaded_file2 = SimpleUploadedFile(
-        "dup1.txt", duplicate_content, content_type="text/plain"
-    )
-    upload_request2 = env["factory"].post("/files/", {"file": uploaded_file2})
-    upload_request2.headers = {"UserId": user_id}
-    env["upload_view"](upload_request2)
-
-    uploaded_file3 = SimpleUploadedFile(
-        "dup2.txt", duplicate_content, content_type="text/plain"
-    )
-    upload_request3 = env["factory"].post("/files/", {"file": uploaded_file3})
-    upload_request3.headers = {"UserId": user_id}
-    env["upload_view"](upload_request3)
-
-    # Get storage stats
-    request = env["factory"].get("/files/storage_stats/")
-    request.headers = {"UserId": user_id}
-    response = env["stats_view"](request)
-
-    assert response.status_code == 200
-    assert response.data["user_id"] == user_id
-
-    unique_size = len(unique_content)
-    duplicate_size = len(duplicate_content)
+    """Test that the rate limit holds across requests, each with its own viewset"""
+    shared_rate_limiter.max_calls = 2
+    factory = APIRequestFactory()
 
-    # Total storage: unique file + one copy of duplicate
-    expected_total = unique_size + duplicate_size
-    assert response.data["total_storage_used"] == expected_total
+    def request_stats(user_id: str) -> Response:
+        request = factory.get("/files/storage_stats/")
+        request.headers = {"UserId": user_id}
+        return stats_view(request)
 
-    # Original storage: unique file + two copies of duplicate
-    expected_original = unique_size + (duplicate_size * 2)
-    assert response.data["original_storage_used"] == expected_original
+    assert request_stats("limited_user").status_code == 200
+    assert request_stats("limited_user").status_code == 200
 
-    # Savings: one copy of duplicate content
-    expected_savings = duplicate_size
-    assert response.data["storage_savings"] == expected_savings
+    response = request_stats("limited_user")
+    assert response.status_code == 429
+    assert response.data["error"] == "Call Limit Reached"
+    assert uuid.UUID(response.data["request_id"])
+    assert response.data["rate_limit_info"]["remaining_calls"] == 0
 
-    # Savings percentage
-    expected_percentage = (expected_savings / expected_original) * 100
-    assert abs(response.data["savings_percentage"] - expected_percentage) < 0.1
+    # Other users have their own window
+    assert request_stats("other_user").status_code == 200
 
 
 @pytest.mark.django_db
@@ -296,49 +222,31 @@ def test_storage_stats_user_isolation(setup_test_environment: dict[str, any]) ->
     shared_content = b"Shared content between users"
 
     # User 1 uploads the file
-    uploaded_file1 = SimpleUploadedFile(
-        "user1_file.txt", shared_content, content_type="text/plain"
-    )
-    upload_request1 = env["factory"].post("/files/", {"file": uploaded_file1})
-    upload_request1.headers = {"UserId": "user1"}
-    env["upload_view"](upload_request1)
+    upload(env, "user1", "user1_file.txt", shared_content)
 
     # User 2 uploads the same content (will be deduplicated)
-    uploaded_file2 = SimpleUploadedFile(
-        "user2_file.txt", shared_content, content_type="text/plain"
-    )
-    upload_request2 = env["factory"].post("/files/", {"file": uploaded_file2})
-    upload_request2.headers = {"UserId": "user2"}
-    env["upload_view"](upload_request2)
+    upload(env, "user2", "user2_file.txt", shared_content)
 
     # Get storage stats for user1
-    request1 = env["factory"].get("/files/storage_stats/")
-    request1.headers = {"UserId": "user1"}
-    response1 = env["stats_view"](request1)
-
-    assert response1.status_code == 200
-    assert response1.data["user_id"] == "user1"
+    data1 = get_stats(env, "user1")
+    assert data1["user_id"] == "user1"
 
     file_size = len(shared_content)
-    assert response1.data["total_storage_used"] == file_size
-    assert response1.data["original_storage_used"] == file_size
-    assert response1.data["storage_savings"] == 0
-    assert response1.data["savings_percentage"] == 0.0
+    assert data1["total_storage_used"] == file_size
+    assert data1["original_storage_used"] == file_size
+    assert data1["storage_savings"] == 0
+    assert data1["savings_percentage"] == 0.0
 
     # Get storage stats for user2
-    request2 = env["factory"].get("/files/storage_stats/")
-    request2.headers = {"UserId": "user2"}
-    response2 = env["stats_view"](request2)
-
-    assert response2.status_code == 200
-    assert response2.data["user_id"] == "user2"
+    data2 = get_stats(env, "user2")
+    assert data2["user_id"] == "user2"
 
     # User2 also shows the same since each user's stats are calculated independently
     # but they reference the same storage record
-    assert response2.data["total_storage_used"] == file_size
-    assert response2.data["original_storage_used"] == file_size
-    assert response2.data["storage_savings"] == 0
-    assert response2.data["savings_percentage"] == 0.0
+    assert data2["total_storage_used"] == file_size
+    assert data2["original_storage_used"] == file_size
+    assert data2["storage_savings"] == 0
+    assert data2["savings_percentage"] == 0.0
 
 
 @pytest.mark.django_db
@@ -349,19 +257,10 @@ def test_storage_stats_response_format(setup_test_environment: dict[str, any]) -
 
     # Upload a file to ensure non-zero stats
     file_content = b"Content for format testing"
-    uploaded_file = SimpleUploadedFile(
-        "format_test.txt", file_content, content_type="text/plain"
-    )
-    upload_request = env["factory"].post("/files/", {"file": uploaded_file})
-    upload_request.headers = {"UserId": user_id}
-    env["upload_view"](upload_request)
+    upload(env, user_id, "format_test.txt", file_content)
 
     # Get storage stats
-    request = env["factory"].get("/files/storage_stats/")
-    request.headers = {"UserId": user_id}
-    response = env["stats_view"](request)
-
-    assert response.status_code == 200
+    data = get_stats(env, user_id)
 
     # Verify response contains all required fields
     required_fields = [
@@ -373,77 +272,84 @@ def test_storage_stats_response_format(setup_test_environment: dict[str, any]) -
     ]
 
     for field in required_fields:
-        assert field in response.data, f"Missing required field: {field}"
+        assert field in data, f"Missing required field: {field}"
 
     # Verify field types
-    assert isinstance(response.data["user_id"], str)
-    assert isinstance(response.data["total_storage_used"], int)
-    assert isinstance(response.data["original_storage_used"], int)
-    assert isinstance(response.data["storage_savings"], int)
-    assert isinstance(response.data["savings_percentage"], (int, float))
+    assert isinstance(data["user_id"], str)
+    assert isinstance(data["total_storage_used"], int)
+    assert isinstance(data["original_storage_used"], int)
+    assert isinstance(data["storage_savings"], int)
+    assert isinstance(data["savings_percentage"], (int, float))
 
     # Verify that user_id matches the requesting user
-    assert response.data["user_id"] == user_id
+    assert data["user_id"] == user_id
+
+
+# Uploads per scenario with the expected deduplication savings percentage.
+# Stored bytes count each distinct content once; original bytes count every upload.
+STATS_CASES = {
+    "single_file": (
+        [("single.txt", b"Single file content for testing")],
+        0.0,
+    ),
+    "with_duplicates": (
+        [
+            ("original.txt", DEDUP_CONTENT),
+            ("duplicate.txt", DEDUP_CONTENT),
+            ("another_duplicate.txt", DEDUP_CONTENT),
+        ],
+        66.7,  # 2 of 3 copies saved
+    ),
+    "multiple_unique_files": (
+        [
+            ("file1.txt", b"First unique file content"),
+            ("file2.txt", b"Second unique file content"),
+            ("file3.txt", b"Third unique file content"),
+        ],
+        0.0,
+    ),
+    "mixed_files": (
+        [
+            ("unique.txt", b"Unique file content"),
+            ("dup1.txt", b"Duplicate file content for testing"),
+            ("dup2.txt", b"Duplicate file content for testing"),
+        ],
+        39.1,  # 34 of 19 + 34 * 2 bytes saved
+    ),
+    # 1 unique file (100 bytes), 3 copies of 200 bytes, 2 copies of 50 bytes:
+    # 350 bytes stored, 800 uploaded, 450 saved
+    "calculations_accuracy": (
+        [("unique.txt", CONTENT_X100)]
+        + [(f"dup1_{i}.txt", CONTENT_Y200) for i in range(3)]
+        + [(f"dup2_{i}.txt", CONTENT_Z50) for i in range(2)],
+        56.2,  # 56.25 rounded to one decimal place
+    ),
+}
 
 
 @pytest.mark.django_db
-def test_storage_stats_calculations_accuracy(
+@pytest.mark.parametrize(
+    "files,expected_percentage", STATS_CASES.values(), ids=STATS_CASES.keys()
+)
+def test_storage_stats_savings(
     setup_test_environment: dict[str, any],
+    files: list[tuple[str, bytes]],
+    expected_percentage: float,
 ) -> None:
-    """Test the accuracy of storage calculations with complex scenario"""
+    """Test storage stats for unique and duplicate uploads of one user"""
     env = setup_test_environment
-    user_id = "calculation_test_user"
+    user_id = "savings_user"
 
-    # Create a complex scenario:
-    # - 1 unique file (100 bytes)
-    # - 3 copies of duplicate content (200 bytes each)
-    # - 2 copies of another duplicate content (50 bytes each)
-
-    # Unique file
-    unique_content = b"x" * 100  # 100 bytes
-    uploaded_file1 = SimpleUploadedFile(
-        "unique.txt", unique_content, content_type="text/plain"
-    )
-    upload_request1 = env["factory"].post("/files/", {"file": uploaded_file1})
-    upload_request1.headers = {"UserId": user_id}
-    env["upload_view"](upload_request1)
-
-    # First duplicate set (200 bytes each, 3 copies)
-    duplicate1_content = b"y" * 200  # 200 bytes
-    for i in range(3):
-        uploaded_file = SimpleUploadedFile(
-            f"dup1_{i}.txt", duplicate1_content, content_type="text/plain"
-        )
-        upload_request = env["factory"].post("/files/", {"file": uploaded_file})
-        upload_request.headers = {"UserId": user_id}
-        env["upload_view"](upload_request)
-
-    # Second duplicate set (50 bytes each, 2 copies)
-    duplicate2_content = b"z" * 50  # 50 bytes
-    for i in range(2):
-        uploaded_file = SimpleUploadedFile(
-            f"dup2_{i}.txt", duplicate2_content, content_type="text/plain"
-        )
-        upload_request = env["factory"].post("/files/", {"file": uploaded_file})
-        upload_request.headers = {"UserId": user_id}
-        env["upload_view"](upload_request)
+    for filename, content in files:
+        upload(env, user_id, filename, content)
 
     # Get storage stats
-    request = env["factory"].get("/files/storage_stats/")
-    request.headers = {"UserId": user_id}
-    response = env["stats_view"](request)
-
-    assert response.status_code == 200
-
-    # Expected calculations:
-    # Total storage used (deduplicated): 100 + 200 + 50 = 350 bytes
-    # Original storage used (without dedup): 100 + (200*3) + (50*2) = 100 + 600 + 100 = 800 bytes
-    # Storage savings: 800 - 350 = 450 bytes
-    # Savings percentage: (450/800) * 100 = 56.25%
-
-    assert response.data["total_storage_used"] == 350
-    assert response.data["original_storage_used"] == 800
-    assert response.data["storage_savings"] == 450
-    assert (
-        abs(response.data["savings_percentage"] - 56.2) < 0.1
-    )  # Allow small rounding difference
\ No newline at end of file
+    data = get_stats(env, user_id)
+    assert data["user_id"] == user_id
+
+    expected_total = sum(len(content) for content in {c for _, c in files})
+    expected_original = sum(len(content) for _, content in files)
+    assert data["total_storage_used"] == expected_total
+    assert data["original_storage_used"] == expected_original
+    assert data["storage_savings"] == expected_original - expected_total
+    assert data["savings_percentage"] == pytest.approx(expected_percentage, abs=0.1)
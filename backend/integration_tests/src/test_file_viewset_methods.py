@@ -1,13 +1,20 @@
 import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
-from rest_framework.test import APIRequestFactory, APIClient
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
 from rest_framework import status
-from files.views import FileViewSet
-from files.models import File
-from typing import Any
+from src.files.views import FileViewSet
+from src.files.models import File, FileStorage
+from src.files.utils import calculate_file_hash
 
+# Known SHA-256 digests of the test_file_bytes / test_file_large contents, pinned
+# as literals (cross-checked with sha256sum) so they don't share code with the
+# implementation under test
+EXPECTED_HASH_TEST = "6ae8a75555209fd6c44157c0aed8016e763ff435a19cf186f76863140143ff72"
+EXPECTED_HASH_LARGE = "6ab72eeb9e77b07540897e0c8d6d23ec8eef0f8c3a47e1b3f4e93443d9536bed"
 
-@pytest.fixture
+
+@pytest.fixture(scope="session")
 def api_request_factory():
     """
   Fixture providing APIRequestFactory for creating test requests.
@@ -18,7 +25,7 @@ def api_request_factory():
     return APIRequestFactory()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def file_viewset():
     """
   Fixture providing FileViewSet instance for testing.
@@ -29,35 +36,51 @@ def file_viewset():
     return FileViewSet()
 
 
+@pytest.fixture(scope="session")
+def test_file_bytes():
+    """
+  Fixture providing the known content of the simple test file.
+
+  Returns:
+      bytes: Test file content, shared across the session
+  """
+    return b"test content"
+
+
+@pytest.fixture(scope="session")
+def make_file():
+    """
+  Fixture providing a factory for uploaded test files.
+
+  Returns:
+      Callable: Builds a fresh SimpleUploadedFile from a name and shared bytes
+  """
+    def _make_file(name: str, content: bytes, content_type: str = "text/plain"):
+        return SimpleUploadedFile(name=name, content=content, content_type=content_type)
+
+    return _make_file
+
+
 @pytest.fixture
-def test_file():
+def test_file(make_file, test_file_bytes):
     """
   Fixture providing a simple uploaded file for testing.
 
   Returns:
       SimpleUploadedFile: Test file with known content
   """
-    return SimpleUploadedFile(
-        name="test.txt",
-        content=b"test content",
-        content_type="text/plain"
-    )
+    return make_file("test.txt", test_file_bytes)
 
 
 @pytest.fixture
-def test_file_large():
+def test_file_large(make_file):
     """
   Fixture providing a larger uploaded file for edge case testing.
 
   Returns:
       SimpleUploadedFile: Large test file (1KB content)
   """
-    large_content = b"A" * 1024  # 1KB of 'A' characters
-    return SimpleUploadedFile(
-        name="large_test.txt",
-        content=large_content,
-        content_type="text/plain"
-    )
+    return make_file("large_test.txt", b"A" * 1024)  # 1KB of 'A' characters
 
 
 @pytest.fixture
@@ -75,226 +98,139 @@ def valid_user_id():
 class TestFileViewSetMethodsIntegration:
     """Integration tests for FileViewSet individual methods using pytest fixtures."""
 
-    def test_validate_file_upload_success(self, api_request_factory, file_viewset, test_file):
+    def test_get_user_id_success(self, api_request_factory, file_viewset, valid_user_id):
         """
-        Test successful file validation using fixtures.
-
-        Validates that the method returns a valid uploaded file object with correct
-        properties, regardless of the specific file object type (Django may convert
-        SimpleUploadedFile to InMemoryUploadedFile during request processing).
+        Test successful user ID extraction from headers.
 
         Args:
             api_request_factory: Factory for creating HTTP requests
             file_viewset: FileViewSet instance
-            test_file: Test uploaded file
+            valid_user_id: Valid test user ID
         """
-        request = api_request_factory.post('/', {'file': test_file})
-        result = file_viewset._validate_file_upload(request)
-
-        # Assert that result is a valid uploaded file object (not error Response)
-        assert not hasattr(result, 'status_code'), "Expected file object, got Response"
+        request = api_request_factory.get('/', HTTP_USERID=f"  {valid_user_id} ")
+        result = file_viewset._get_user_id(request)
 
-        # Assert file properties are preserved correctly
-        assert result.name == "test.txt", f"Expected filename 'test.txt', got '{result.name}'"
-        assert result.content_type == "text/plain", f"Expected 'text/plain', got '{result.content_type}'"
-        assert result.size == len(b"test content"), f"Expected size {len(b'test content')}, got {result.size}"
-
-        # Assert file content is accessible and correct
-        file_content = result.read()
-        assert file_content == b"test content", f"Expected b'test content', got {file_content}"
-
-        # Assert file pointer can be reset (important for subsequent operations)
-        result.seek(0)
-        assert result.read() == b"test content", "File content should be readable after seek(0)"
+        # Assert user ID is extracted and stripped
+        assert result == valid_user_id
+        assert isinstance(result, str)
 
-    def test_validate_file_upload_failure(self, api_request_factory, file_viewset):
+    def test_get_user_id_missing(self, api_request_factory, file_viewset):
         """
-    Test file validation failure when no file provided.
+        Test user ID extraction returns None when the header is missing or blank.
 
-    Args:
-        api_request_factory: Factory for creating HTTP requests
-        file_viewset: FileViewSet instance
-    """
-        request = api_request_factory.post('/', {})  # No file uploaded
-        result = file_viewset._validate_file_upload(request)
-
-        # Assert error Response is returned
-        assert hasattr(result, 'status_code')
-        assert result.status_code == status.HTTP_400_BAD_REQUEST
-        assert 'No file provided' in result.data['error']
+        Args:
+            api_request_factory: Factory for creating HTTP requests
+            file_viewset: FileViewSet instance
+        """
+        assert file_viewset._get_user_id(api_request_factory.get('/')) is None
+        assert file_viewset._get_user_id(api_request_factory.get('/', HTTP_USERID="  ")) is None
 
-    def test_extract_user_id_success(self, api_request_factory, file_viewset, valid_user_id):
+    def test_get_user_id_cached_on_request(self, api_request_factory, file_viewset, valid_user_id):
         """
-    Test successful user ID extraction from headers.
+        Test the parsed user ID is reused for later lookups on the same request.
 
-    Args:
-        api_request_factory: Factory for creating HTTP requests
-        file_viewset: FileViewSet instance
-        valid_user_id: Valid test user ID
-    """
+        Args:
+            api_request_factory: Factory for creating HTTP requests
+            file_viewset: FileViewSet instance
+            valid_user_id: Valid test user ID
+        """
         request = api_request_factory.get('/', HTTP_USERID=valid_user_id)
-        result = file_viewset._extract_user_id(request)
+        assert file_viewset._get_user_id(request) == valid_user_id
 
-        # Assert user ID is extracted correctly
-        assert result == valid_user_id
-        assert isinstance(result, str)
+        request.META["HTTP_USERID"] = "someone_else"
+        assert file_viewset._get_user_id(request) == valid_user_id
 
-    def test_extract_user_id_failure(self, api_request_factory, file_viewset):
+    def test_create_without_file(self, api_request_factory, create_view, valid_user_id):
         """
-    Test user ID extraction failure when header missing.
+        Test create rejects a request without a file before touching storage.
 
-    Args:
-        api_request_factory: Factory for creating HTTP requests
-        file_viewset: FileViewSet instance
-    """
-        request = api_request_factory.get('/')  # No UserId header
-        result = file_viewset._extract_user_id(request)
-
-        # Assert error Response is returned
-        assert hasattr(result, 'status_code')
-        assert result.status_code == status.HTTP_400_BAD_REQUEST
-        assert 'UserId header is required' in result.data['error']
-
-    def test_process_file_content_success(self, file_viewset, test_file):
-        """Test successful file content processing and hash calculation."""
-        # Reset file pointer to ensure clean test state
-        test_file.seek(0)
+        Args:
+            api_request_factory: Factory for creating HTTP requests
+            create_view: POST /files/ view callable
+            valid_user_id: Valid test user ID
+        """
+        request = api_request_factory.post('/files/', {}, HTTP_USERID=valid_user_id)
+        response = create_view(request)
 
-        file_content, file_hash = file_viewset._process_file_content(test_file)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'No file provided' in response.data['error']
 
-        # Assert file content is read correctly
-        assert file_content == b"test content"
-        assert isinstance(file_content, bytes)
+    def test_calculate_file_hash(self, test_file):
+        """Test hashing an upload returns its SHA-256 and rewinds the file."""
+        file_hash = calculate_file_hash(test_file)
 
-        # Assert hash is calculated correctly
-        assert isinstance(file_hash, str)
-        assert len(file_hash) == 64  # SHA-256 hex length
+        assert file_hash == EXPECTED_HASH_TEST
 
         # Verify file pointer was reset (can read again)
         assert test_file.read() == b"test content"
 
-    def test_process_file_content_with_large_file(self, file_viewset, test_file_large):
+    def test_calculate_file_hash_with_large_file(self, test_file_large):
         """
-    Test file content processing with larger file.
-
-    Args:
-        file_viewset: FileViewSet instance
-        test_file_large: Large test uploaded file
-    """
-        file_content, file_hash = file_viewset._process_file_content(test_file_large)
-
-        # Assert large file is processed correctly
-        assert len(file_content) == 1024
-        assert isinstance(file_hash, str)
-        assert len(file_hash) == 64
-
-    def test_prepare_file_data_creates_correct_structure(self, file_viewset, test_file, valid_user_id):
-        """Test that file data preparation creates correct dictionary structure."""
-        test_hash = "abc123def456"  # Mock hash for testing
-
-        # ← FIX: Add required dedup_metadata parameter
-        dedup_metadata = {
-            'is_reference': False,
-            'original_file': None,
-            'reference_count': 1
-        }
-
-        result = file_viewset._prepare_file_data(test_file, valid_user_id, test_hash, dedup_metadata)
-
-        # Assert all required fields are present
-        expected_fields = {
-            'file', 'original_filename', 'file_type', 'size', 'user_id', 'file_hash',
-            'is_reference', 'original_file', 'reference_count'  # ← Add missing fields
-        }
-        actual_fields = set(result.keys())
-        assert actual_fields == expected_fields
-
-        # Assert field values are correct
-        assert result['file'] == test_file
-        assert result['original_filename'] == "test.txt"
-        assert result['file_type'] == "text/plain"
-        assert result['size'] == len(b"test content")
-        assert result['user_id'] == valid_user_id
-        assert result['file_hash'] == test_hash
-
-    def test_user_specific_deduplication_workflow(self):
-        """Integration test for user-specific deduplication workflow."""
-        client = APIClient()
-        upload_url = '/api/files/'
-
-        # Same content for all uploads
-        test_content = b"Shared document content"
-        user1_id = "user_001"
-        user2_id = "user_002"
-
-        # User 1: First upload - should create original file
-        file1 = SimpleUploadedFile("doc1.txt", test_content, content_type="text/plain")
-        response1 = client.post(
-            upload_url,
-            {'file': file1},
-            HTTP_USERID=user1_id,
-            format='multipart'
-        )
-
-        assert response1.status_code == 201
-        assert response1.data['is_reference'] is False
-        assert response1.data['reference_count'] == 1
-        assert response1.data['user_id'] == user1_id
-
-        # User 1: Second upload (same content) - should create reference
-        file2 = SimpleUploadedFile("doc1_copy.txt", test_content, content_type="text/plain")
-        response2 = client.post(
-            upload_url,
-            {'file': file2},
-            HTTP_USERID=user1_id,  # Same user
-            format='multipart'
-        )
+        Test hashing a larger upload matches hashing its content in memory.
 
-        # DEBUG: Print error details if request fails
-        if response2.status_code != 201:
-            print(f"Response2 status: {response2.status_code}")
-            print(f"Response2 data: {response2.data}")
-
-        assert response2.status_code == 201
-        assert response2.data['is_reference'] is True  # This is a reference
-        assert response2.data['original_file'] == response1.data['id']
-        assert response2.data['user_id'] == user1_id
-
-        # User 2: Upload same content - should create NEW original file (not reference)
-        file3 = SimpleUploadedFile("doc2.txt", test_content, content_type="text/plain")
-        response3 = client.post(
-            upload_url,
-            {'file': file3},
-            HTTP_USERID=user2_id,  # Different user
-            format='multipart'
-        )
-
-        assert response3.status_code == 201
-        assert response3.data['is_reference'] is False  # New original for user 2
-        assert response3.data['reference_count'] == 1
-        assert response3.data['original_file'] is None
-        assert response3.data['user_id'] == user2_id
+        Args:
+            test_file_large: Large test uploaded file
+        """
+        file_hash = calculate_file_hash(test_file_large)
 
-        # Verify user 1's original file reference count was updated
-        user1_original = File.objects.get(id=response1.data['id'])
-        assert user1_original.reference_count == 2  # Original + 1 reference
-        assert user1_original.user_id == user1_id
+        assert file_hash == EXPECTED_HASH_LARGE
+        assert file_hash == File.calculate_file_hash(test_file_large.read())
 
-        # Verify user 2's file is completely separate
-        user2_original = File.objects.get(id=response3.data['id'])
-        assert user2_original.reference_count == 1  # Only original
-        assert user2_original.user_id == user2_id
+    def test_apply_filters(self, api_request_factory, file_viewset, valid_user_id):
+        """
+        Test query parameter filters narrow the user's files.
 
-        # Verify same hash but different user context
-        assert response1.data['file_hash'] == response3.data['file_hash']  # Same content hash
-        assert user1_original.id != user2_original.id  # Different file records
+        Args:
+            api_request_factory: Factory for creating HTTP requests
+            file_viewset: FileViewSet instance
+            valid_user_id: Valid test user ID
+        """
+        for name, file_type, size in [
+            ("report.pdf", "application/pdf", 100),
+            ("notes.txt", "text/plain", 2000),
+        ]:
+            storage = FileStorage.objects.create(
+                file_hash=f"filter_{name}", s3_path=f"test/{name}", size=size
+            )
+            File.objects.create(
+                storage=storage, user_id=valid_user_id, original_filename=name, file_type=file_type
+            )
+        queryset = File.objects.filter(user_id=valid_user_id)
+
+        def filtered_names(query: str) -> set[str]:
+            request = Request(api_request_factory.get(f'/files/?{query}'))
+            return set(
+                file_viewset._apply_filters(request, queryset).values_list("original_filename", flat=True)
+            )
+
+        assert filtered_names("search=REPORT") == {"report.pdf"}
+        assert filtered_names("file_type=text/plain") == {"notes.txt"}
+        assert filtered_names("min_size=1000") == {"notes.txt"}
+        assert filtered_names("max_size=1000") == {"report.pdf"}
+        # Invalid values are ignored
+        assert filtered_names("min_size=abc") == {"report.pdf", "notes.txt"}
+
+    def test_create_rejects_upload_over_quota(
+        self, api_request_factory, create_view, make_file, test_file_bytes, valid_user_id, monkeypatch
+    ):
+        """
+        Test create rejects a new upload over the quota without storing anything.
 
+        Args:
+            api_request_factory: Factory for creating HTTP requests
+            create_view: POST /files/ view callable
+            make_file: Builds the uploaded file
+            test_file_bytes: Content of the upload
+            valid_user_id: Valid test user ID
+        """
+        monkeypatch.setenv("TOTAL_STORAGE_LIMIT_Z_MB", "0")
 
-@pytest.fixture(scope="session")
-def django_db_setup():
-    """
-  Fixture for Django database setup at session level.
+        request = api_request_factory.post(
+            '/files/', {'file': make_file("quota.txt", test_file_bytes)}, HTTP_USERID=valid_user_id
+        )
+        response = create_view(request)
 
-  This ensures database is properly configured for integration tests.
-  """
-    pass  # Django test database will be created automatically
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response.data['error'] == "Storage Quota Exceeded"
+        assert response.data['attempted_upload_bytes'] == len(test_file_bytes)
+        assert not File.objects.filter(user_id=valid_user_id).exists()
@@ -0,0 +1,44 @@
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_user_storage(apps, schema_editor):
+    """Populate UserStorage with each user's deduplicated usage"""
+    File = apps.get_model("files", "File")
+    FileStorage = apps.get_model("files", "FileStorage")
+    UserStorage = apps.get_model("files", "UserStorage")
+
+    # Clear File's default ordering, which would otherwise make uploaded_at part of
+    # the DISTINCT and repeat users with several files
+    user_ids = File.objects.order_by().values_list("user_id", flat=True).distinct()
+    UserStorage.objects.bulk_create(
+        UserStorage(
+            user_id=user_id,
+            total_bytes=FileStorage.objects.filter(
+                id__in=File.objects.filter(user_id=user_id).values("storage_id")
+            ).aggregate(total=Coalesce(Sum("size"), 0))["total"],
+        )
+        for user_id in user_ids
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("files", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserStorage",
+            fields=[
+                (
+                    "user_id",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("total_bytes", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_user_storage, migrations.RunPython.noop),
+    ]
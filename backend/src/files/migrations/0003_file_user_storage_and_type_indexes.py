@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-15 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("files", "0002_userstorage"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="file",
+            index=models.Index(
+                fields=["user_id", "storage"], name="files_file_user_id_f11f62_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="file",
+            index=models.Index(
+                fields=["user_id", "file_type"], name="files_file_user_id_11f2e8_idx"
+            ),
+        ),
+    ]
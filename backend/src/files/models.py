@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
 import uuid
 import hashlib
 from pathlib import Path
@@ -67,6 +69,80 @@ class FileStorage(models.Model):
         return f"Storage {self.file_hash[:8]}... ({self.reference_count} refs)"
 
 
+class UserStorage(models.Model):
+    """
+    Denormalized per-user storage usage counter
+
+    total_bytes holds the deduplicated usage of a user: the size of every distinct
+    FileStorage referenced by at least one of their File records, counted once. It is
+    maintained by File.save() and File.delete() so quota checks are a primary-key lookup
+    instead of a SUM over the user's files.
+
+    File.objects.bulk_create() and File QuerySet.delete() rebuild the counters of the
+    users they touch. Cascade deletes from FileStorage bypass both and do not update
+    the counter; call UserStorage.rebuild() afterwards.
+
+    SQL Schema:
+    CREATE TABLE files_userstorage (
+        user_id VARCHAR(255) PRIMARY KEY,      -- User identifier from header
+        total_bytes BIGINT NOT NULL DEFAULT 0  -- Deduplicated bytes referenced by the user
+    );
+    """
+
+    user_id = models.CharField(max_length=255, primary_key=True)
+    total_bytes = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.user_id}: {self.total_bytes} bytes"
+
+    @classmethod
+    def lock(cls, user_id: str) -> None:
+        """
+        Lock the user's counter row, creating it if needed, until the surrounding
+        transaction ends. Serializes File.save()/delete() for the same user so their
+        shared-storage checks can't miss each other's rows.
+        """
+        cls.objects.select_for_update().get_or_create(user_id=user_id)
+
+    @classmethod
+    def adjust(cls, user_id: str, delta: int) -> None:
+        """Atomically add delta bytes to the user's counter, creating the row if needed"""
+        cls.objects.get_or_create(user_id=user_id)
+        cls.objects.filter(user_id=user_id).update(total_bytes=F("total_bytes") + delta)
+
+    @classmethod
+    def rebuild(cls, user_ids: "list[str] | set[str]") -> None:
+        """Recompute the counters of the given users from their File records"""
+        for user_id in user_ids:
+            user_storage_ids = File.objects.filter(user_id=user_id).values("storage_id")
+            total = FileStorage.objects.filter(id__in=user_storage_ids).aggregate(
+                total=Coalesce(Sum("size"), 0)
+            )["total"]
+            cls.objects.update_or_create(
+                user_id=user_id, defaults={"total_bytes": total}
+            )
+
+
+class FileQuerySet(models.QuerySet):
+    """
+    Bulk writes skip File.save()/delete(), so these rebuild the UserStorage counters
+    of the affected users instead of leaving them to drift
+    """
+
+    def bulk_create(self, objs, *args, **kwargs) -> "list[File]":
+        with transaction.atomic():
+            files = super().bulk_create(objs, *args, **kwargs)
+            UserStorage.rebuild({file.user_id for file in files})
+        return files
+
+    def delete(self) -> tuple[int, dict[str, int]]:
+        with transaction.atomic():
+            user_ids = set(self.values_list("user_id", flat=True))
+            result = super().delete()
+            UserStorage.rebuild(user_ids)
+        return result
+
+
 class File(models.Model):
     """
     File Deduplication Architecture - Logical File Layer
@@ -118,6 +194,8 @@ class File(models.Model):
         default=False
     )  # Track if this was a duplicate upload
 
+    objects = FileQuerySet.as_manager()
+
     @property
     def size(self) -> int:
         """Get file size from storage"""
@@ -133,11 +211,54 @@ class File(models.Model):
         indexes = [
             models.Index(fields=["user_id", "-uploaded_at"]),
             models.Index(fields=["user_id"]),
+            # Covering indexes for the per-user storage_stats sum and file_types list
+            models.Index(fields=["user_id", "storage"]),
+            models.Index(fields=["user_id", "file_type"]),
         ]
 
     def __str__(self) -> str:
         return self.original_filename
 
+    def _shares_storage_with_user_file(self) -> bool:
+        """Check whether another file of the same user references the same storage"""
+        return (
+            File.objects.filter(user_id=self.user_id, storage_id=self.storage_id)
+            .exclude(pk=self.pk)
+            .exists()
+        )
+
+    def save(self, *args, usage_reserved: bool = False, **kwargs) -> None:
+        """
+        Save the file, counting its storage towards the user's usage when new.
+        Pass usage_reserved=True when the size was already added to the user's
+        usage (see StorageLimitService.reserve_storage); the reservation is given
+        back if the file turns out to share storage the user already has.
+        """
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
+
+        with transaction.atomic():
+            UserStorage.lock(self.user_id)
+            super().save(*args, **kwargs)
+            shares_storage = self._shares_storage_with_user_file()
+            if not shares_storage and not usage_reserved:
+                UserStorage.adjust(self.user_id, self.storage.size)
+            elif shares_storage and usage_reserved:
+                UserStorage.adjust(self.user_id, -self.storage.size)
+
+    def delete(self, *args, **kwargs) -> tuple[int, dict[str, int]]:
+        """
+        Delete the file, releasing its storage from the user's usage if unshared.
+        Not called when the file is removed by a cascade from its FileStorage, so
+        only delete a storage once it has no files left, or rebuild the counters.
+        """
+        with transaction.atomic():
+            UserStorage.lock(self.user_id)
+            if not self._shares_storage_with_user_file():
+                UserStorage.adjust(self.user_id, -self.storage.size)
+            return super().delete(*args, **kwargs)
+
     @staticmethod
     def calculate_file_hash(file_content: bytes) -> str:
         """Calculate SHA-256 hash of file content for deduplication"""
@@ -149,4 +270,4 @@ class File(models.Model):
         try:
             return FileStorage.objects.get(file_hash=file_hash)
         except FileStorage.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
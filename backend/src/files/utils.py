@@ -1,7 +1,9 @@
 import hashlib
-from typing import BinaryIO
 from django.core.files.uploadedfile import UploadedFile
 
+# Chunk size for hashing uploads (1MB)
+HASH_CHUNK_SIZE = 1 << 20
+
 
 def calculate_file_hash(file_obj: UploadedFile) -> str:
     """
@@ -14,18 +16,25 @@ def calculate_file_hash(file_obj: UploadedFile) -> str:
         str: Hexadecimal SHA-256 hash string (64 characters)
 
     Explanation:
-        - hashlib.sha256() creates a new SHA-256 hash object
-        - We read the file in 4KB chunks to handle large files efficiently
+        - On Python 3.11+, hashlib.file_digest() feeds the file to OpenSSL's SHA-256
+          through a reusable buffer and releases the GIL while hashing
+        - On older Pythons we read the file in 1MB chunks to handle large files
+          without loading them into memory
         - file_obj.seek(0) resets file pointer to beginning after hashing
         - hexdigest() returns the hash as a hexadecimal string
     """
-    hash_obj = hashlib.sha256()  # Create SHA-256 hash object
+    file_obj.seek(0)  # Hash from the start, like File.chunks() does
+
+    if hasattr(hashlib, "file_digest"):
+        hash_obj = hashlib.file_digest(file_obj, "sha256")
+    else:
+        hash_obj = hashlib.sha256()  # Create SHA-256 hash object
 
-    # Read file in chunks to handle large files without loading into memory
-    for chunk in file_obj.chunks(chunk_size=4096):
-        hash_obj.update(chunk)  # Update hash with current chunk
+        # Read file in chunks to handle large files without loading into memory
+        for chunk in file_obj.chunks(chunk_size=HASH_CHUNK_SIZE):
+            hash_obj.update(chunk)  # Update hash with current chunk
 
     # Reset file pointer to beginning for subsequent operations
     file_obj.seek(0)
 
-    return hash_obj.hexdigest()  # Return 64-character hex string
\ No newline at end of file
+    return hash_obj.hexdigest()  # Return 64-character hex string
@@ -1,25 +1,33 @@
+import logging
 import os
 from functools import wraps
 from typing import Callable, Any
 
 from django.db import transaction
 from django.utils.dateparse import parse_datetime
-from django.db.models import QuerySet
+from django.db.models import F, QuerySet, Sum
+from django.db.models.functions import Coalesce
 
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.request import Request
 from rest_framework.pagination import PageNumberPagination
-from django.http import HttpResponse
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.http import HttpResponse, StreamingHttpResponse
 from .models import File, FileStorage
 from .serializers import FileSerializer
-import io
+from .utils import calculate_file_hash
 
 from ..services.rate_limiter_service import RateLimiterService
 from ..services.s3_file_service import S3FileService
 from ..services.storage_limit_service import StorageLimitService
 
+logger = logging.getLogger(__name__)
+
+# Marks a request whose UserId header hasn't been parsed yet
+_NOT_PARSED = object()
+
 
 def rate_limit_required(func: Callable[[...], Any]) -> Callable[[...], Any]:
     """Decorator to apply rate limiting to view methods"""
@@ -68,8 +76,14 @@ class FileViewSet(viewsets.ModelViewSet):
     serializer_class = FileSerializer
     pagination_class = FilesPagination
 
+    # DRF creates a viewset per request, so the rate limiter lives on the class to
+    # keep its request windows across requests. RATE_LIMIT_* are therefore read
+    # once, at import time
+    rate_limiter: RateLimiterService = RateLimiterService()
+
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
+        # Cheap per request: S3FileService shares one boto3 client per configuration
         self.file_service: S3FileService = S3FileService(
             bucket_name=os.getenv("AWS_BUCKET_NAME", ""),
             aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
@@ -77,15 +91,23 @@ class FileViewSet(viewsets.ModelViewSet):
             endpoint_url=os.getenv("AWS_ENDPOINT_URL"),
             region_name=os.getenv("AWS_REGION", "us-east-1"),
         )
-        self.rate_limiter: RateLimiterService = RateLimiterService()
+        # Optional namespace for uploaded object keys (e.g. per-test isolation)
+        self.key_prefix: str = os.getenv("AWS_KEY_PREFIX", "")
+        # Per request on purpose: its usage memo must not outlive the request,
+        # since other workers change usage too
         self.storage_limit_service: StorageLimitService = StorageLimitService()
 
     def _get_user_id(self, request: Request) -> str | None:
-        """Extract and validate UserId from request headers"""
-        user_id = request.headers.get("UserId")
-        if not user_id or not user_id.strip():
-            return None
-        return user_id.strip()
+        """
+        Extract and validate UserId from request headers.
+        The result is cached on the request, since rate_limit_required and the
+        view method both look it up.
+        """
+        user_id = getattr(request, "_cached_user_id", _NOT_PARSED)
+        if user_id is _NOT_PARSED:
+            user_id = (request.headers.get("UserId") or "").strip() or None
+            request._cached_user_id = user_id
+        return user_id
 
     @rate_limit_required
     def list(self, request: Request, *args, **kwargs) -> Response:
@@ -129,7 +151,7 @@ class FileViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     def _apply_filters(
-            self, request: Request, queryset: QuerySet[File]
+        self, request: Request, queryset: QuerySet[File]
     ) -> QuerySet[File]:
         """Apply query parameter filters to the queryset"""
         # Search by filename (case-insensitive partial match)
@@ -191,22 +213,22 @@ class FileViewSet(viewsets.ModelViewSet):
                 {"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Read file content and calculate hash for deduplication
-        file_content = file_obj.read()
-        file_hash = File.calculate_file_hash(file_content)
+        # Calculate hash for deduplication, streaming the upload in chunks
+        file_hash = calculate_file_hash(file_obj)
 
-        # Check storage limit (only for new files)
+        # Reserve quota for new files up front. The check and the increment are one
+        # conditional UPDATE, so parallel uploads can't all pass a stale check
         existing_storage = File.find_existing_storage(file_hash)
+        usage_reserved = False
         if not existing_storage:
-            # This is a new file, check storage limit
-            is_allowed, error_message = self.storage_limit_service.check_storage_limit(
+            usage_reserved = self.storage_limit_service.reserve_storage(
                 user_id, file_obj.size
             )
-            if not is_allowed:
+            if not usage_reserved:
                 quota_info = self.storage_limit_service.get_storage_quota_info(user_id)
                 return Response(
                     {
-                        "error": error_message,
+                        "error": "Storage Quota Exceeded",
                         "current_usage_bytes": quota_info.current_usage_bytes,
                         "limit_bytes": quota_info.limit_bytes,
                         "attempted_upload_bytes": file_obj.size,
@@ -214,50 +236,84 @@ class FileViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_429_TOO_MANY_REQUESTS,
                 )
 
-        is_duplicate = existing_storage is not None
+        source_path = None
+        if not existing_storage:
+            # New file - stream it to S3 before opening the transaction, so the
+            # database transaction isn't held open for the whole upload
+            # Organize by hash prefix
+            source_path = f"{self.key_prefix}files/{file_hash[:8]}/{file_obj.name}"
 
-        with transaction.atomic():
-            if existing_storage:
-                # File is duplicate - increment reference count
-                existing_storage.reference_count += 1
-                existing_storage.save()
-                storage = existing_storage
-            else:
-                # New file - upload to S3 and create storage record
-                file_content_io = io.BytesIO(file_content)
-                source_path = (
-                    f"files/{file_hash[:8]}/{file_obj.name}"  # Organize by hash prefix
+            try:
+                if isinstance(file_obj, TemporaryUploadedFile):
+                    # Large uploads are already spooled to disk by Django, so let
+                    # boto3 read the parts from the file instead of the stream
+                    self.file_service.upload_file(
+                        file_obj.temporary_file_path(), source_path
+                    )
+                else:
+                    self.file_service.upload_fileobj(file_obj, source_path)
+            except Exception as e:
+                self.storage_limit_service.release_storage(user_id, file_obj.size)
+                return Response(
+                    {"error": f"Failed to upload to S3: {str(e)}"},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 )
 
-                try:
-                    self.file_service.upload_fileobj(file_content_io, source_path)
-                except Exception as e:
-                    return Response(
-                        {"error": f"Failed to upload to S3: {str(e)}"},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        try:
+            with transaction.atomic():
+                if existing_storage:
+                    storage, created = existing_storage, False
+                else:
+                    # Create new storage record, unless a concurrent upload of the
+                    # same content created it since the lookup above
+                    storage, created = FileStorage.objects.get_or_create(
+                        file_hash=file_hash,
+                        defaults={"s3_path": source_path, "size": file_obj.size},
                     )
 
-                # Create new storage record
-                storage = FileStorage.objects.create(
-                    file_hash=file_hash, s3_path=source_path, size=file_obj.size
+                if not created:
+                    # File is duplicate - increment reference count in the database
+                    # so concurrent uploads of the same content can't lose an increment
+                    FileStorage.objects.filter(pk=storage.pk).update(
+                        reference_count=F("reference_count") + 1
+                    )
+                    storage.refresh_from_db(fields=["reference_count"])
+
+                # Create File record (always created, even for duplicates)
+                file_record = File(
+                    storage=storage,
+                    user_id=user_id,
+                    original_filename=file_obj.name,
+                    file_type=file_obj.content_type or "application/octet-stream",
+                    is_duplicate=not created,
+                )
+                file_record.save(usage_reserved=usage_reserved)
+        except Exception:
+            # The reservation was made outside the transaction, so undo it by hand
+            if usage_reserved:
+                self.storage_limit_service.release_storage(user_id, file_obj.size)
+            raise
+
+        if source_path and storage.s3_path != source_path:
+            # Lost the race to a concurrent upload of the same content, whose object
+            # is the one kept. Ours is an orphan, unless it landed on the same key
+            try:
+                self.file_service.delete_file(source_path)
+            except Exception as e:
+                logger.warning(
+                    "Failed to delete orphaned S3 object %s: %s", source_path, e
                 )
 
-            # Create File record (always created, even for duplicates)
-            file_record = File.objects.create(
-                storage=storage,
-                user_id=user_id,
-                original_filename=file_obj.name,
-                file_type=file_obj.content_type or "application/octet-stream",
-                is_duplicate=is_duplicate,
-            )
+        # Usage changed, drop the memoized value for this user
+        self.storage_limit_service.invalidate(user_id)
 
-            # Serialize the file record for response
-            serializer = self.get_serializer(file_record)
+        # Serialize the file record for response
+        serializer = self.get_serializer(file_record)
 
-            headers = self.get_success_headers(serializer.data)
-            return Response(
-                serializer.data, status=status.HTTP_201_CREATED, headers=headers
-            )
+        headers = self.get_success_headers(serializer.data)
+        return Response(
+            serializer.data, status=status.HTTP_201_CREATED, headers=headers
+        )
 
     @rate_limit_required
     def destroy(self, request: Request, *args, **kwargs) -> Response:
@@ -287,8 +343,12 @@ class FileViewSet(viewsets.ModelViewSet):
             # Delete the File record first
             instance.delete()
 
-            # Decrement reference count and handle storage cleanup
-            storage.reference_count -= 1
+            # Decrement reference count in the database, so a concurrent duplicate
+            # upload's increment isn't overwritten by saving a stale count
+            FileStorage.objects.filter(pk=storage.pk).update(
+                reference_count=F("reference_count") - 1
+            )
+            storage.refresh_from_db(fields=["reference_count"])
 
             if storage.reference_count <= 0:
                 # No more references, delete from S3 and remove storage record
@@ -297,13 +357,14 @@ class FileViewSet(viewsets.ModelViewSet):
                 except Exception as e:
                     # Log the error but don't fail the delete operation
                     # The database cleanup will still happen
-                    print(f"Warning: Failed to delete file from S3: {e}")
+                    logger.warning(
+                        "Failed to delete S3 object %s: %s", storage.s3_path, e
+                    )
 
                 # Delete the storage record
                 storage.delete()
-            else:
-                # Still has references, just update the count
-                storage.save()
+
+        self.storage_limit_service.invalidate(user_id)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -313,14 +374,13 @@ class FileViewSet(viewsets.ModelViewSet):
         """Get storage usage statistics for the user"""
         user_id = self._get_user_id(request)
 
-        # Get user's files
-        user_files = File.objects.filter(user_id=user_id).select_related("storage")
-
         # Use StorageLimitService to get total storage used (deduplicated)
         total_storage_used = self.storage_limit_service.get_user_storage_usage(user_id)
 
         # Calculate original storage that would be used without deduplication
-        original_storage_used = sum(file.storage.size for file in user_files)
+        original_storage_used = File.objects.filter(user_id=user_id).aggregate(
+            total=Coalesce(Sum("storage__size"), 0)
+        )["total"]
 
         # Calculate savings
         storage_savings = original_storage_used - total_storage_used
@@ -373,19 +433,17 @@ class FileViewSet(viewsets.ModelViewSet):
             return HttpResponse("File not found", status=404)
 
         try:
-            # Download file from S3
-            file_obj = self.file_service.download_fileobj(instance.storage.s3_path)
-            file_content = file_obj.read()
-
-            # Create HTTP response with the file content
-            response = HttpResponse(
-                file_content,
-                content_type=instance.file_type or 'application/octet-stream'
-            )
-            response['Content-Disposition'] = f'attachment; filename="{instance.original_filename}"'
-            response['Content-Length'] = str(instance.storage.size)
+            # Stream the file from S3 instead of reading it into memory first
+            chunks = self.file_service.iter_file_chunks(instance.storage.s3_path)
+        except Exception as e:
+            return HttpResponse(f"Failed to download file: {str(e)}", status=500)
 
-            return response
+        response = StreamingHttpResponse(
+            chunks, content_type=instance.file_type or "application/octet-stream"
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{instance.original_filename}"'
+        )
+        response["Content-Length"] = str(instance.storage.size)
 
-        except Exception as e:
-            return HttpResponse(f"Failed to download file: {str(e)}", status=500)
\ No newline at end of file
+        return response
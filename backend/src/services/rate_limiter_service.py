@@ -1,26 +1,106 @@
 import os
 import time
 import uuid
-from collections import defaultdict, deque
+from array import array
 from threading import Lock
 from dataclasses import dataclass
 
+# Number of locks user request windows are sharded across
+LOCK_SHARDS = 64
+
+# Minimum seconds between sweeps that drop idle users' request windows
+SWEEP_INTERVAL_SECONDS = 60
+
 
 @dataclass
-class RequestInfo:
-    request_id: str
-    timestamp: float
-    user_id: str
+class RequestWindow:
+    """
+    Timestamps of a user's last max_calls allowed requests, kept as a ring buffer.
+    head points at the oldest slot, which is the next one to be overwritten.
+    Unused slots hold 0.0, which is always outside the window.
+    """
+
+    timestamps: array
+    head: int = 0
 
 
 class RateLimiterService:
+    """
+    Sliding-window rate limiter keyed by user ID.
+    RATE_LIMIT_N_CALLS and RATE_LIMIT_X_SECONDS are read when an instance is
+    created; FileViewSet keeps one instance for the whole process, so for the API
+    they are read once at import time. User IDs come from a client-controlled
+    header, so windows of users idle for longer than the time window are swept
+    periodically instead of being kept forever.
+    """
+
     def __init__(self):
         self.max_calls = int(os.environ.get("RATE_LIMIT_N_CALLS", 2))
         self.time_window = int(os.environ.get("RATE_LIMIT_X_SECONDS", 1))
-        self.user_requests: dict[str, deque[RequestInfo]] = defaultdict(deque)
-        self.lock = Lock()
+        self.user_requests: dict[str, RequestWindow] = {}
+        # Each user's window is guarded by one of a fixed set of locks, so requests
+        # from different users rarely wait on each other
+        self.locks = [Lock() for _ in range(LOCK_SHARDS)]
+        self._sweep_lock = Lock()
+        self._last_sweep = time.time()
+
+    def _lock_for(self, user_id: str) -> Lock:
+        """Return the lock guarding a user's request window."""
+        return self.locks[hash(user_id) % LOCK_SHARDS]
+
+    def _user_window(self, user_id: str) -> RequestWindow:
+        """Return a user's request window, creating it on first use."""
+        window = self.user_requests.get(user_id)
+        if window is None:
+            # setdefault is atomic, so users on different shards can't clobber
+            # each other's newly created windows
+            window = self.user_requests.setdefault(
+                user_id, RequestWindow(array("d", [0.0] * self.max_calls))
+            )
+        return window
+
+    def _active_timestamps(self, user_id: str, current_time: float) -> list[float]:
+        """Timestamps of the user's requests still inside the time window."""
+        window = self.user_requests.get(user_id)
+        if window is None:
+            return []
+        return [t for t in window.timestamps if current_time - t < self.time_window]
 
-    def is_allowed(self, user_id: str) -> tuple[bool, str, str | None]:
+    def _newest_timestamp(self, window: RequestWindow) -> float:
+        """Timestamp of the most recent allowed request in a window"""
+        return window.timestamps[(window.head - 1) % self.max_calls]
+
+    def _maybe_sweep(self, current_time: float) -> None:
+        """Drop idle windows, at most once per sweep interval and by one caller"""
+        interval = max(self.time_window, SWEEP_INTERVAL_SECONDS)
+        if current_time - self._last_sweep < interval:
+            return
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = current_time
+            self.sweep_idle_windows(current_time)
+        finally:
+            self._sweep_lock.release()
+
+    def sweep_idle_windows(self, current_time: float | None = None) -> int:
+        """Remove windows whose newest request is outside the time window"""
+        if current_time is None:
+            current_time = time.time()
+        removed = 0
+        for user_id in list(self.user_requests):
+            with self._lock_for(user_id):
+                window = self.user_requests.get(user_id)
+                if (
+                    window is not None
+                    and current_time - self._newest_timestamp(window)
+                    >= self.time_window
+                ):
+                    del self.user_requests[user_id]
+                    removed += 1
+        return removed
+
+    def is_allowed(self, user_id: str) -> tuple[bool, str, str]:
         request_id, is_allowed = self.add_request(user_id)
         if is_allowed:
             return True, "", request_id
@@ -28,52 +108,49 @@ class RateLimiterService:
             return False, "Call Limit Reached", request_id
 
     def get_rate_limit_info(self, user_id: str) -> dict[str, int]:
-        current_count = self.get_current_request_count(user_id)
-
-        with self.lock:
-            user_queue = self.user_requests[user_id]
-            next_reset = user_queue[0].timestamp + self.time_window if user_queue else 0
-            return {
-                "remaining_calls": max(0, self.max_calls - current_count),
-                "reset_time": int(next_reset) if user_queue else 0,
-                "limit": self.max_calls,
-                "window": self.time_window,
-            }
-
-    def _clean_expired_requests(self, user_id: str, current_time: float) -> None:
-        """Remove expired requests from user's queue."""
-        user_queue = self.user_requests[user_id]
-        while user_queue and current_time - user_queue[0].timestamp >= self.time_window:
-            user_queue.popleft()
+        current_time = time.time()
+
+        with self._lock_for(user_id):
+            active = self._active_timestamps(user_id, current_time)
+
+        return {
+            "remaining_calls": max(0, self.max_calls - len(active)),
+            "reset_time": int(min(active) + self.time_window) if active else 0,
+            "limit": self.max_calls,
+            "window": self.time_window,
+        }
 
     def add_request(self, user_id: str) -> tuple[str, bool]:
-        """Add a request to the user's queue if allowed by rate limit."""
+        """
+        Record a request in the user's window if allowed by rate limit.
+        Every call gets a request ID, rejected ones included, so 429 responses can
+        be traced too. It is generated outside the lock.
+        """
+        allowed = self.max_calls > 0
         current_time = time.time()
-        request_id = str(uuid.uuid4())
+        if allowed:
+            self._maybe_sweep(current_time)
+            with self._lock_for(user_id):
+                window = self._user_window(user_id)
 
-        with self.lock:
-            self._clean_expired_requests(user_id, current_time)
-            user_queue = self.user_requests[user_id]
+                # The oldest of the last max_calls requests is still in the window
+                allowed = (
+                    current_time - window.timestamps[window.head] >= self.time_window
+                )
+                if allowed:
+                    window.timestamps[window.head] = current_time
+                    window.head = (window.head + 1) % self.max_calls
 
-            if len(user_queue) >= self.max_calls:
-                return request_id, False
-
-            request_info = RequestInfo(
-                request_id=request_id, timestamp=current_time, user_id=user_id
-            )
-            user_queue.append(request_info)
-            return request_id, True
+        return str(uuid.uuid4()), allowed
 
     def get_current_request_count(self, user_id: str) -> int:
         """Get the current number of active requests for a user."""
         current_time = time.time()
 
-        with self.lock:
-            self._clean_expired_requests(user_id, current_time)
-            return len(self.user_requests[user_id])
+        with self._lock_for(user_id):
+            return len(self._active_timestamps(user_id, current_time))
 
     def clear_user_requests(self, user_id: str) -> None:
         """Clear all requests for a specific user."""
-        with self.lock:
-            if user_id in self.user_requests:
-                self.user_requests[user_id].clear()
\ No newline at end of file
+        with self._lock_for(user_id):
+            self.user_requests.pop(user_id, None)
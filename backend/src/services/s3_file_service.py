@@ -1,8 +1,68 @@
 import boto3
 import io
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from functools import lru_cache
+from typing import BinaryIO, Iterator
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from mypy_boto3_s3 import S3Client
 
+# Parallelism for per-object deletes when the store lacks DeleteObjects
+_DELETE_FALLBACK_WORKERS = 10
+
+# DeleteObjects batches in flight while empty_bucket keeps listing pages
+_DELETE_BATCH_WORKERS = 8
+
+# Upper bound on concurrent objects in upload_many/download_many; more threads
+# than this contend on the connection pool instead of adding throughput
+MAX_TRANSFER_WORKERS = 16
+
+# Chunk size for streaming downloads (1MB)
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Multipart settings for upload_fileobj/download_fileobj: objects above 8MB are
+# transferred as 16MB parts, up to 16 parts in flight at once
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=16,
+    use_threads=True,
+)
+
+# Client settings: enough pooled connections for concurrent requests and multipart
+# parts on a shared client, keep-alive, and standard retries (with throttling
+# backoff) capped at 3 attempts. A short connect timeout keeps an unreachable store
+# from holding a request for minutes; reads keep botocore's 60s default.
+_CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    retries={"max_attempts": 3, "mode": "standard"},
+    tcp_keepalive=True,
+    connect_timeout=3,
+    read_timeout=60,
+)
+
+
+@lru_cache(maxsize=8)
+def _get_shared_client(**client_kwargs: str) -> S3Client:
+    """
+    Return one S3 client per distinct credentials/endpoint/region. Clients are
+    thread-safe, so every S3FileService (and thread) with the same settings shares
+    one, along with its connection pool and resolved credentials.
+    """
+    # Build it from its own session, since the default session isn't thread-safe
+    return boto3.session.Session().client("s3", config=_CLIENT_CONFIG, **client_kwargs)
+
+
+def _known_size(file_obj: BinaryIO) -> int | None:
+    """Size of an in-memory BytesIO or a Django UploadedFile, None if unknown"""
+    if isinstance(file_obj, io.BytesIO):
+        return file_obj.getbuffer().nbytes
+    return getattr(file_obj, "size", None)
+
+
 class S3FileService:
     """
     Service Class for S3 File Operations.
@@ -25,24 +85,112 @@ class S3FileService:
         if region_name:
             client_kwargs["region_name"] = region_name
 
-        self.s3_client: S3Client = boto3.client("s3", **client_kwargs)
+        self.s3_client: S3Client = _get_shared_client(**client_kwargs)
         self.bucket_name: str = bucket_name
+        # Set once the bucket is known to exist, so create_bucket can skip the probe
+        self._bucket_verified: bool = False
 
-    def upload_fileobj(self, file_obj: io.BytesIO, source_path: str) -> None:
+    def upload_fileobj(self, file_obj: BinaryIO, source_path: str) -> None:
+        """
+        Upload a file object. Below the multipart threshold it is sent as one
+        PutObject, skipping the transfer manager's thread pool and part buffers.
+        """
+        size = _known_size(file_obj)
         try:
-            self.s3_client.upload_fileobj(file_obj, self.bucket_name, source_path)
-        except ClientError as e:
+            if size is not None and size < _TRANSFER_CONFIG.multipart_threshold:
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name, Key=source_path, Body=file_obj
+                )
+            else:
+                self.s3_client.upload_fileobj(
+                    file_obj, self.bucket_name, source_path, Config=_TRANSFER_CONFIG
+                )
+        except (ClientError, S3UploadFailedError) as e:
+            raise Exception(f"Failed to upload file to S3: {str(e)}")
+
+    def upload_file(self, local_path: str, source_path: str) -> None:
+        """
+        Upload a file from disk. The transfer manager reads multipart parts straight
+        from the file, so nothing is copied into Python memory first.
+        """
+        try:
+            self.s3_client.upload_file(
+                local_path, self.bucket_name, source_path, Config=_TRANSFER_CONFIG
+            )
+        except (ClientError, S3UploadFailedError) as e:
             raise Exception(f"Failed to upload file to S3: {str(e)}")
 
     def download_fileobj(self, source_path: str) -> io.BytesIO:
         try:
             file_obj = io.BytesIO()
-            self.s3_client.download_fileobj(self.bucket_name, source_path, file_obj)
+            self.s3_client.download_fileobj(
+                self.bucket_name, source_path, file_obj, Config=_TRANSFER_CONFIG
+            )
             file_obj.seek(0)
             return file_obj
         except ClientError as e:
             raise Exception(f"Failed to download file from S3: {str(e)}")
 
+    def upload_many(
+            self,
+            items: list[tuple[BinaryIO, str]],
+            max_workers: int = MAX_TRANSFER_WORKERS,
+    ) -> None:
+        """
+        Upload several (file_obj, source_path) pairs concurrently on the shared client.
+        The first failure is raised once the uploads have been attempted.
+        """
+        workers = min(max_workers, MAX_TRANSFER_WORKERS, len(items))
+        if not workers:
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Consume the iterator so the first failure is raised here
+            list(executor.map(lambda item: self.upload_fileobj(*item), items))
+
+    def download_many(
+            self, source_paths: list[str], max_workers: int = MAX_TRANSFER_WORKERS
+    ) -> list[io.BytesIO]:
+        """
+        Download several files concurrently on the shared client, returned in the
+        order of source_paths
+        """
+        workers = min(max_workers, MAX_TRANSFER_WORKERS, len(source_paths))
+        if not workers:
+            return []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.download_fileobj, source_paths))
+
+    def iter_file_chunks(
+            self, source_path: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """
+        Stream a file from S3 in chunks, without holding the whole object in memory.
+        The GET is issued right away, so a missing object raises here rather than
+        while the chunks are being consumed.
+        """
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=source_path)
+        except ClientError as e:
+            raise Exception(f"Failed to download file from S3: {str(e)}")
+
+        def chunks() -> Iterator[bytes]:
+            with closing(response["Body"]) as body:
+                yield from body.iter_chunks(chunk_size=chunk_size)
+
+        return chunks()
+
+    def exists(self, source_path: str) -> bool:
+        """
+        Check whether an object exists in S3 using HEAD (no body is transferred)
+        """
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=source_path)
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise Exception(f"Failed to check file in S3: {str(e)}")
+
     def delete_file(self, source_path: str) -> None:
         """
         Delete a file from S3
@@ -54,8 +202,13 @@ class S3FileService:
 
     def create_bucket(self) -> None:
         """
-        Create the bucket if it doesn't exist
+        Create the bucket if it doesn't exist. A HEAD probe comes first, so an
+        existing bucket costs a read instead of a CreateBucket call.
         """
+        if self._bucket_verified or self._bucket_exists():
+            self._bucket_verified = True
+            return
+
         try:
             # Get the region from the client configuration
             client_region = self.s3_client.meta.region_name or "us-east-1"
@@ -76,19 +229,78 @@ class S3FileService:
                     and error_code != "BucketAlreadyExists"
             ):
                 raise Exception(f"Failed to create bucket: {str(e)}")
+        self._bucket_verified = True
+
+    def _bucket_exists(self) -> bool:
+        """
+        Check whether the bucket exists using HEAD. Any error, a 404 or e.g. a 403 on
+        a bucket owned by someone else, falls through to CreateBucket to handle.
+        """
+        try:
+            self.s3_client.head_bucket(Bucket=self.bucket_name)
+            return True
+        except ClientError:
+            return False
+
+    def empty_bucket(self, prefix: str = "") -> None:
+        """
+        Delete all objects in the bucket (or only those under prefix), keeping the
+        bucket itself. Each listed page (at most 1000 keys, the DeleteObjects limit)
+        is removed with a single batched request, sent while the next page is listed.
+        """
+        try:
+            paginator = self.s3_client.get_paginator("list_objects_v2")
+            with ThreadPoolExecutor(max_workers=_DELETE_BATCH_WORKERS) as executor:
+                batches = [
+                    executor.submit(self._delete_keys, keys)
+                    for page in paginator.paginate(
+                        Bucket=self.bucket_name,
+                        Prefix=prefix,
+                        PaginationConfig={"PageSize": 1000},
+                    )
+                    if (keys := [obj["Key"] for obj in page.get("Contents", [])])
+                ]
+                # Raise the first failed batch once all of them have finished
+                for batch in batches:
+                    batch.result()
+        except ClientError as e:
+            raise Exception(f"Failed to empty bucket: {str(e)}")
+
+    def _delete_keys(self, keys: list[str]) -> None:
+        """
+        Delete up to 1000 keys with one DeleteObjects request, falling back to
+        concurrent single-object deletes on stores that don't implement it
+        """
+        try:
+            response = self.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "NotImplemented":
+                raise
+            with ThreadPoolExecutor(max_workers=_DELETE_FALLBACK_WORKERS) as executor:
+                # Consume the iterator so the first failure is raised here
+                list(executor.map(self._delete_key, keys))
+            return
+
+        # DeleteObjects reports per-key failures in the body, not as an error
+        if response.get("Errors"):
+            raise Exception(
+                f"Failed to empty bucket: {response['Errors'][0]['Message']}"
+            )
+
+    def _delete_key(self, key: str) -> None:
+        self.s3_client.delete_object(Bucket=self.bucket_name, Key=key)
 
     def delete_bucket(self) -> None:
         """Delete the bucket and all its contents"""
-        try:
-            # First delete all objects in the bucket
-            response = self.s3_client.list_objects_v2(Bucket=self.bucket_name)
-            if "Contents" in response:
-                objects = [{"Key": obj["Key"]} for obj in response["Contents"]]
-                self.s3_client.delete_objects(
-                    Bucket=self.bucket_name, Delete={"Objects": objects}
-                )
+        # First delete all objects in the bucket
+        self.empty_bucket()
 
+        try:
             # Then delete the bucket itself
             self.s3_client.delete_bucket(Bucket=self.bucket_name)
+            self._bucket_verified = False
         except ClientError as e:
             raise Exception(f"Failed to delete bucket: {str(e)}")
\ No newline at end of file
@@ -1,5 +1,6 @@
 import os
 from dataclasses import dataclass
+from typing import Iterable
 
 
 @dataclass
@@ -15,16 +16,46 @@ class StorageLimitService:
     def __init__(self):
         self.limit_mb = int(os.environ.get("TOTAL_STORAGE_LIMIT_Z_MB", 10))
         self.limit_bytes = self.limit_mb * 1024 * 1024
+        # Memoized usage per user, so quota checks within a request share one query
+        self._usage_cache: dict[str, int] = {}
 
     def get_user_storage_usage(self, user_id: str) -> int:
         """Calculate total storage usage for a user in bytes (deduplicated)"""
-        from src.files.models import FileStorage
+        if user_id in self._usage_cache:
+            return self._usage_cache[user_id]
 
-        # Get distinct storage records for this user (handles deduplication)
-        user_storage_records = FileStorage.objects.filter(
-            files__user_id=user_id
-        ).distinct()
-        return sum(storage.size for storage in user_storage_records)
+        from src.files.models import UserStorage
+
+        # Deduplicated usage is maintained on UserStorage by File.save()/delete(),
+        # so this is a primary-key lookup independent of the user's file count
+        usage = (
+            UserStorage.objects.filter(user_id=user_id)
+            .values_list("total_bytes", flat=True)
+            .first()
+            or 0
+        )
+        self._usage_cache[user_id] = usage
+        return usage
+
+    def get_bulk_user_storage_usage(self, user_ids: Iterable[str]) -> dict[str, int]:
+        """Get storage usage in bytes for several users with a single query"""
+        from src.files.models import UserStorage
+
+        usage_by_user = dict.fromkeys(user_ids, 0)
+        usage_by_user.update(
+            UserStorage.objects.filter(user_id__in=usage_by_user).values_list(
+                "user_id", "total_bytes"
+            )
+        )
+        self._usage_cache.update(usage_by_user)
+        return usage_by_user
+
+    def invalidate(self, user_id: str | None = None) -> None:
+        """Drop cached usage for a user, or for every user when user_id is None"""
+        if user_id is None:
+            self._usage_cache.clear()
+        else:
+            self._usage_cache.pop(user_id, None)
 
     def check_storage_limit(
         self, user_id: str, additional_size: int
@@ -37,6 +68,30 @@ class StorageLimitService:
 
         return True, ""
 
+    def reserve_storage(self, user_id: str, additional_size: int) -> bool:
+        """
+        Atomically add additional_size to the user's usage if it stays within the
+        limit. The check and the increment are a single conditional UPDATE, so
+        concurrent uploads can't both pass the check and overshoot the quota.
+        """
+        from django.db.models import F
+
+        from src.files.models import UserStorage
+
+        UserStorage.objects.get_or_create(user_id=user_id)
+        updated = UserStorage.objects.filter(
+            user_id=user_id, total_bytes__lte=self.limit_bytes - additional_size
+        ).update(total_bytes=F("total_bytes") + additional_size)
+        self.invalidate(user_id)
+        return updated > 0
+
+    def release_storage(self, user_id: str, size: int) -> None:
+        """Give back bytes reserved by reserve_storage, e.g. after a failed upload"""
+        from src.files.models import UserStorage
+
+        UserStorage.adjust(user_id, -size)
+        self.invalidate(user_id)
+
     def get_storage_quota_info(self, user_id: str) -> StorageQuotaInfo:
         """Get detailed storage quota information for a user"""
         current_usage = self.get_user_storage_usage(user_id)
@@ -55,4 +110,4 @@ class StorageLimitService:
 
     def get_limit_mb(self) -> int:
         """Get the storage limit in MB"""
-        return self.limit_mb
\ No newline at end of file
+        return self.limit_mb